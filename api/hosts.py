@@ -1,6 +1,19 @@
 """Host API endpoints"""
-import sqlite3
-import random
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.cleaning import ConnectionPool, hash_code, new_code, verify_code
+
+_pool = None
+
+def _get_pool():
+    """Lazily build the shared connection pool for module-level helpers."""
+    global _pool
+    if _pool is None:
+        _pool = ConnectionPool('cleaning.db')
+    return _pool
 
 def add_host_routes(api):
     """Add host-related routes to the API"""
@@ -8,66 +21,53 @@ def add_host_routes(api):
 
 # Host registration/login
 def register_host(name, phone):
-    conn = sqlite3.connect('cleaning.db')
-    c = conn.cursor()
-    
-    # Check if exists
-    c.execute("SELECT id, code FROM hosts WHERE phone = ?", (phone,))
-    row = c.fetchone()
-    
-    if row:
-        conn.close()
-        return {"id": row[0], "code": row[1], "exists": True}
-    
-    # Create new
-    code = str(random.randint(100000, 999999))
-    c.execute("INSERT INTO hosts (name, phone, code) VALUES (?, ?, ?)", (name, phone, code))
-    host_id = c.lastrowid
-    conn.commit()
-    conn.close()
-    
-    return {"id": host_id, "code": code, "exists": False}
+    # UPSERT instead of SELECT-then-INSERT on the registration path
+    code = new_code()
+    with _get_pool().acquire() as conn:
+        row = conn.exec("""
+            INSERT INTO hosts (name, phone, code, code_hash) VALUES (?, ?, ?, ?)
+            ON CONFLICT(phone) DO NOTHING
+            RETURNING id, code
+        """, (name, phone, code, hash_code(code))).fetchone()
+        if row:
+            conn.commit()
+            return {"id": row["id"], "code": row["code"], "exists": False}
+        # end the (empty) transaction the conflicting INSERT opened
+        conn.commit()
+        row = conn.exec("SELECT id, code FROM hosts WHERE phone = ?", (phone,)).fetchone()
+
+    return {"id": row["id"], "code": row["code"], "exists": True}
 
 def verify_host(phone, code):
-    conn = sqlite3.connect('cleaning.db')
-    c = conn.cursor()
-    c.execute("SELECT id, name, code FROM hosts WHERE phone = ?", (phone,))
-    row = c.fetchone()
-    conn.close()
-    
+    with _get_pool().acquire(readonly=True) as conn:
+        row = conn.exec("SELECT id, name, code_hash FROM hosts WHERE phone = ?", (phone,)).fetchone()
+
     if not row:
         return None
-    
-    if str(row[2]) == str(code):
+
+    if verify_code(code, row["code_hash"]):
         return {"id": row[0], "name": row[1]}
-    
+
     return None
-"""Host API endpoints"""
-import sqlite3
-import random
 
 def get_all_hosts():
-    conn = sqlite3.connect('cleaning.db')
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
-    c.execute("SELECT * FROM hosts ORDER BY id")
-    rows = c.fetchall()
-    conn.close()
-    return [{"id": r["id"], "name": r["name"], "phone": r["phone"], "code": r["code"]} for r in rows]
+    with _get_pool().acquire(readonly=True) as conn:
+        cur = conn.exec("SELECT id, name, phone, code FROM hosts ORDER BY id")
+        cur.row_factory = None  # plain tuples, no per-row Row wrapper
+        rows = cur.fetchall()
+    return [{"id": i, "name": n, "phone": p, "code": c} for (i, n, p, c) in rows]
 
 def add_host(name, phone):
-    conn = sqlite3.connect('cleaning.db')
-    c = conn.cursor()
-    code = str(random.randint(100000, 999999))
-    c.execute("INSERT INTO hosts (name, phone, code) VALUES (?, ?, ?)", (name, phone, code))
-    host_id = c.lastrowid
-    conn.commit()
-    conn.close()
+    with _get_pool().acquire() as conn:
+        c = conn.cursor()
+        code = new_code()
+        c.execute("INSERT INTO hosts (name, phone, code, code_hash) VALUES (?, ?, ?, ?)",
+                  (name, phone, code, hash_code(code)))
+        host_id = c.lastrowid
+        conn.commit()
     return {"id": host_id, "code": code}
 
 def update_host(host_id, data):
-    conn = sqlite3.connect('cleaning.db')
-    c = conn.cursor()
     updates = []
     params = []
     if data.get("name"):
@@ -78,15 +78,13 @@ def update_host(host_id, data):
         params.append(data["phone"])
     if updates:
         params.append(host_id)
-        c.execute(f"UPDATE hosts SET {', '.join(updates)} WHERE id = ?", params)
-        conn.commit()
-    conn.close()
+        with _get_pool().acquire() as conn:
+            conn.execute(f"UPDATE hosts SET {', '.join(updates)} WHERE id = ?", params)
+            conn.commit()
     return {"message": "Host updated"}
 
 def delete_host(host_id):
-    conn = sqlite3.connect('cleaning.db')
-    c = conn.cursor()
-    c.execute("DELETE FROM hosts WHERE id = ?", (host_id,))
-    conn.commit()
-    conn.close()
+    with _get_pool().acquire() as conn:
+        conn.execute("DELETE FROM hosts WHERE id = ?", (host_id,))
+        conn.commit()
     return {"message": "Host deleted"}
@@ -9,34 +9,119 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import atexit
+import functools
+import gzip
 import json
+import logging
+import queue
+import re
 import sqlite3
-import random
-import ssl
+import threading
 import time
 import hashlib
-from http.server import HTTPServer, BaseHTTPRequestHandler
-from urllib.parse import urlparse, parse_qs
+from logging.handlers import QueueHandler, QueueListener
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qsl
 from typing import Dict, Any, Optional
 
-from models.cleaning import Database, Property, Cleaner, Job, CleaningRepository
+from models.cleaning import Database, ConnectionPool, Property, Cleaner, Job, CleaningRepository, hash_code, new_code, verify_code
 
 import requests
 
+# orjson 是 C 擴展：dumps 直接輸出 bytes，loads 直接吃 bytes/str；
+# 沒裝就退回 stdlib json
+try:
+    import orjson
+
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+except ImportError:
+    def _dumps(obj) -> bytes:
+        # 緊湊分隔符：輸出和 orjson 一致，也少傳幾個字節
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+    _loads = json.loads
+
+
+# 動態 UPDATE 的語句文本按「更新哪些列」的組合緩存：同形狀的請求
+# 復用同一條 SQL 文本，連接上的語句緩存才有機會命中
+_PROPERTY_FIELDS = ("name", "address", "postal_code", "bedrooms", "bathrooms", "floor", "area",
+                    "province", "city", "street", "house_number", "host_phone",
+                    "cleaning_time_minutes", "cleaning_checklist", "notes")
+_CLEANER_FIELDS = ("name", "phone", "status")
+_HOST_FIELDS = ("name", "phone")
+# _update_order 裡「值為真才更新」的 json key -> 列名
+_ORDER_TRUTHY_FIELDS = (
+    ("property_id", "property_id"),
+    ("checkout_time", "checkout_time"),
+    ("price", "price"),
+    ("status", "status"),
+    ("cleaner_id", "assigned_cleaner_id"),
+)
+
+
+@functools.lru_cache(maxsize=256)
+def _update_sql(table: str, fields: tuple) -> str:
+    return f"UPDATE {table} SET " + ", ".join(f"{f} = ?" for f in fields) + " WHERE id = ?"
+
+
+# _get_orders 的投影：列名與 SELECT 順序一一對應，模塊級只構建一次
+_ORDER_COLS = (
+    "id", "property_id", "cleaner_id", "host_name", "host_phone",
+    "checkout_time", "price", "status", "assigned_cleaner_id", "assigned_at",
+    "created_at", "voice_url", "text_notes", "completion_photos", "accepted_by_host",
+    "property_name", "property_address", "property_province", "property_city",
+    "property_street", "property_house_number", "property_latitude",
+    "property_longitude", "cleaner_name",
+)
+_ORDER_SELECT = """
+    SELECT o.id, o.property_id, o.cleaner_id, o.host_name, o.host_phone,
+           o.checkout_time, o.price, o.status, o.assigned_cleaner_id, o.assigned_at,
+           o.created_at, o.voice_url, o.text_notes, o.completion_photos, o.accepted_by_host,
+           p.name, p.address, p.province, p.city,
+           p.street, p.house_number, p.latitude, p.longitude,
+           c.name
+    FROM orders o
+    LEFT JOIN properties p ON o.property_id = p.id
+    LEFT JOIN cleaners c ON o.assigned_cleaner_id = c.id
+"""
+
 
 # ========== 地址編碼 ==========
+# 復用同一個 Session，TLS 握手只做一次；只緩存成功結果
+_geo_session = requests.Session()
+try:
+    from requests.adapters import HTTPAdapter
+    _geo_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+except Exception:
+    pass
+_geo_latlon_cache: Dict[str, tuple] = {}
+_GEO_CACHE_MAX = 4096
+
+
 def geocode_address(address: str) -> tuple:
     """通過地址獲取經緯度 (lat, lon)"""
     if not address:
         return None, None
+    cached = _geo_latlon_cache.get(address)
+    if cached:
+        return cached
     try:
-        url = f"https://nominatim.openstreetmap.org/search"
+        url = "https://nominatim.openstreetmap.org/search"
         params = {"q": address, "format": "json", "limit": 1}
         headers = {"User-Agent": "SmartClean/1.0"}
-        resp = requests.get(url, params=params, headers=headers, timeout=5)
+        resp = _geo_session.get(url, params=params, headers=headers, timeout=5)
         data = resp.json()
         if data:
-            return float(data[0]["lat"]), float(data[0]["lon"])
+            latlon = (float(data[0]["lat"]), float(data[0]["lon"]))
+            if len(_geo_latlon_cache) >= _GEO_CACHE_MAX:
+                _geo_latlon_cache.clear()
+            _geo_latlon_cache[address] = latlon
+            return latlon
     except Exception as e:
         print(f"Geocode error: {e}")
     return None, None
@@ -44,31 +129,66 @@ def geocode_address(address: str) -> tuple:
 
 # ========== 緩存機制 ==========
 class Cache:
-    """簡單的內存緩存"""
+    """簡單的內存緩存（多線程安全，monotonic 時鐘不怕牆鐘跳變）"""
     def __init__(self, ttl: int = 30):  # 默認30秒TTL
         self._cache: Dict[str, tuple] = {}
+        # tag -> 受該 tag 影響的 key 集合，寫操作按 tag 失效
+        self._tags: Dict[str, set] = {}
         self.ttl = ttl
-    
+        self._lock = threading.Lock()
+        self._ops = 0
+
     def get(self, key: str) -> Optional[Any]:
-        if key in self._cache:
-            value, timestamp = self._cache[key]
-            if time.time() - timestamp < self.ttl:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            value, timestamp = entry
+            if time.monotonic() - timestamp < self.ttl:
                 return value
             del self._cache[key]
-        return None
-    
-    def set(self, key: str, value: Any):
-        self._cache[key] = (value, time.time())
-    
+            return None
+
+    def set(self, key: str, value: Any, tags=()):
+        with self._lock:
+            self._cache[key] = (value, time.monotonic())
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            # 每 1024 次寫掃一遍過期項，把清理成本攤平
+            self._ops += 1
+            if self._ops & 1023 == 0:
+                self._sweep()
+
+    def _sweep(self):
+        # 調用方已持鎖
+        now = time.monotonic()
+        for key, (_, timestamp) in list(self._cache.items()):
+            if now - timestamp >= self.ttl:
+                del self._cache[key]
+
     def invalidate(self, key: str):
-        if key in self._cache:
-            del self._cache[key]
-    
+        with self._lock:
+            self._cache.pop(key, None)
+
+    def invalidate_tag(self, tag: str):
+        """失效某個 tag 下的所有 key，其餘緩存保持熱"""
+        with self._lock:
+            for key in self._tags.pop(tag, ()):
+                self._cache.pop(key, None)
+
     def clear(self):
-        self._cache.clear()
+        with self._lock:
+            self._cache.clear()
+            self._tags.clear()
 
 
 # ========== 驗證工具 ==========
+# O(1) 成員測試 + 預構建的錯誤文案，都只建一次
+_VALID_ORDER_STATUSES = frozenset({"open", "accepted", "arrived", "completed", "cancelled"})
+_INVALID_STATUS_ERROR = ("Invalid status. Must be one of: "
+                         "open, accepted, arrived, completed, cancelled")
+
+
 class Validator:
     """數據驗證工具"""
     
@@ -97,6 +217,19 @@ class Validator:
             return False, "價格格式錯誤"
         return True, None
     
+    @staticmethod
+    def validate_order_update(data: dict) -> tuple:
+        """驗證訂單更新數據"""
+        if data.get("status") and data["status"] not in _VALID_ORDER_STATUSES:
+            return False, _INVALID_STATUS_ERROR
+        if data.get("price"):
+            try:
+                if float(data["price"]) <= 0:
+                    return False, "Price must be greater than 0"
+            except (ValueError, TypeError):
+                return False, "Invalid price"
+        return True, None
+
     @staticmethod
     def validate_cleaner(data: dict) -> tuple:
         """驗證清潔工數據"""
@@ -109,282 +242,233 @@ class Validator:
 
 # ========== Idempotency ==========
 class IdempotencyChecker:
-    """防止重複提交"""
+    """防止重複提交（多線程安全）"""
     def __init__(self):
-        self._keys: Dict[str, float] = {}
+        # 插入順序就是過期順序（窗口固定），check 時從頭上懶惰清理
+        self._keys: "OrderedDict[str, float]" = OrderedDict()
         self._window = 60  # 60秒內不重複處理
-    
+        self._lock = threading.Lock()
+
     def check(self, key: str) -> bool:
         """檢查是否已處理過"""
-        now = time.time()
-        if key in self._keys:
-            if now - self._keys[key] < self._window:
+        with self._lock:
+            now = time.monotonic()
+            while self._keys:
+                oldest, ts = next(iter(self._keys.items()))
+                if ts + self._window > now:
+                    break
+                del self._keys[oldest]
+            if key in self._keys:
                 return False  # 已經處理過
-        self._keys[key] = now
-        return True
-    
-    def cleanup(self):
-        """清理過期的key"""
-        now = time.time()
-        self._keys = {k: v for k, v in self._keys.items() if now - v < self._window}
+            self._keys[key] = now
+            return True
 
 
 class CleaningAPI:
     def __init__(self, db_path: str = "/home/nico/projects/cleaning_service/cleaning.db"):
         self.db = Database(db_path)
+        self.pool = ConnectionPool(db_path)
         self.repo = CleaningRepository(self.db)
         # 緩存實例
         self.cache = Cache(ttl=30)
         self.idempotency = IdempotencyChecker()
         self.validator = Validator()
+        self._stats_lock = threading.Lock()
+        self._geo_mem: Dict[bytes, Dict[str, Any]] = {}
+        # geocode 外呼走獨立小線程池，上游卡頓不佔滿請求線程
+        self._geo_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="geocode")
+        self._exact_routes, self._param_routes = self._build_routes()
     
-    def handle_request(self, method: str, path: str, body: str = "") -> Dict[str, Any]:
-        parsed = urlparse(path)
-        path = parsed.path
-        query = parse_qs(parsed.query)
-        
-        # 首頁
+    def handle_request(self, method: str, path: str, body="") -> Dict[str, Any]:
+        # body 可以是 str 或 bytes，_loads 兩者都接受
+        # 大多數請求沒有 query string，快速路徑連 parse 都省掉
+        q_idx = path.find("?")
+        if q_idx < 0:
+            query = {}
+        else:
+            query = dict(parse_qsl(path[q_idx + 1:]))
+            path = path[:q_idx]
+
+        # 首頁 / 静态页面 / CSS 文件
         if path == "/" or path == "/index.html":
             return {"static": "index.html"}
-        
-        # 静态页面
-        if path in ["/host.html", "/cleaner.html", "/admin.html"]:
-            return {"static": path.lstrip("/")}
-        
-        # CSS 文件
-        if path.startswith("/css/"):
-            return {"static": path.lstrip("/")}
-        
-        # ========== 統計 (帶緩存) ==========
-        if path == "/api/stats":
-            cache_key = "stats"
-            cached = self.cache.get(cache_key)
+        if path in ("/host.html", "/cleaner.html", "/admin.html") or path.startswith("/css/"):
+            return {"static": path[1:]}
+
+        if method in ("POST", "PUT") and body:
+            try:
+                data = _loads(body)
+            except ValueError:  # orjson 的 JSONDecodeError 也是 ValueError
+                return {"error": "Invalid JSON body", "code": 400}
+        else:
+            data = {}
+
+        # 先查精確路徑的 dict（O(1) 命中絕大多數請求），
+        # 再掃帶參數的 regex 路由；ID 由 regex 保證是數字
+        handler = self._exact_routes.get((method, path))
+        if handler is not None:
+            return handler(query, data)
+
+        for route_method, pattern, handler in self._param_routes:
+            if route_method != method:
+                continue
+            m = pattern.match(path)
+            if m:
+                return handler(query, data, *m.groups())
+
+        return {"error": "Not Found", "code": 404}
+
+    def _build_routes(self):
+        """路由表，啟動時構建一次：精確路徑走 dict，帶參數的走編譯好的 regex"""
+        exact = {
+            ("GET",  "/api/stats"):         lambda q, d: self._get_stats_cached(),
+            ("GET",  "/api/cleaner/stats"): lambda q, d: self._get_cleaner_stats(q),
+            ("GET",  "/api/geocode"):       lambda q, d: self._geocode_route(q),
+            ("GET",  "/api/properties"):    lambda q, d: self._list_properties(q),
+            ("POST", "/api/properties"):    lambda q, d: self._add_property(d),
+            ("GET",  "/api/cleaners"):      lambda q, d: self._list_cleaners(q),
+            ("POST", "/api/cleaners"):      lambda q, d: self._add_cleaner(d),
+            ("POST", "/api/hosts/login"):   lambda q, d: self._host_login(d),
+            ("GET",  "/api/hosts"):         lambda q, d: self._get_hosts(),
+            ("POST", "/api/hosts"):         lambda q, d: self._add_host(d),
+            ("GET",  "/api/orders"):        lambda q, d: self._list_orders(q),
+            ("POST", "/api/orders"):        lambda q, d: self._create_order(d),
+        }
+        param = [
+            ("GET",    re.compile(r"^/api/properties/(\d+)$", re.ASCII),
+             lambda q, d, pid: self._get_property_route(int(pid))),
+            ("PUT",    re.compile(r"^/api/properties/(\d+)$", re.ASCII),
+             lambda q, d, pid: self._update_property(int(pid), d)),
+            ("DELETE", re.compile(r"^/api/properties/(\d+)$", re.ASCII),
+             lambda q, d, pid: self._delete_property(int(pid))),
+            ("GET",    re.compile(r"^/api/cleaners/(\d+)$", re.ASCII),
+             lambda q, d, cid: self._get_cleaner(int(cid))),
+            ("PUT",    re.compile(r"^/api/cleaners/(\d+)$", re.ASCII),
+             lambda q, d, cid: self._update_cleaner(int(cid), d)),
+            ("DELETE", re.compile(r"^/api/cleaners/(\d+)$", re.ASCII),
+             lambda q, d, cid: self._delete_cleaner(int(cid))),
+            # 房東驗證碼登錄 (code 不一定是純數字，保持字符串)
+            ("GET",    re.compile(r"^/api/hosts/code/([^/]+)$", re.ASCII),
+             lambda q, d, code: self._host_login_by_code(code)),
+            ("GET",    re.compile(r"^/api/hosts/(\d+)$", re.ASCII),
+             lambda q, d, hid: self._get_host(int(hid))),
+            ("PUT",    re.compile(r"^/api/hosts/(\d+)$", re.ASCII),
+             lambda q, d, hid: self._update_host(int(hid), d)),
+            ("DELETE", re.compile(r"^/api/hosts/(\d+)$", re.ASCII),
+             lambda q, d, hid: self._delete_host(int(hid))),
+            ("POST",   re.compile(r"^/api/orders/(\d+)/verify-accept$", re.ASCII),
+             lambda q, d, oid: self._verify_accept_order(int(oid), d)),
+            ("GET",    re.compile(r"^/api/orders/(\d+)$", re.ASCII),
+             lambda q, d, oid: self._get_order(int(oid))),
+            ("PUT",    re.compile(r"^/api/orders/(\d+)$", re.ASCII),
+             lambda q, d, oid: self._update_order(int(oid), d)),
+            ("DELETE", re.compile(r"^/api/orders/(\d+)$", re.ASCII),
+             lambda q, d, oid: self._delete_order(int(oid))),
+            ("POST",   re.compile(r"^/api/orders/(\d+)$", re.ASCII),
+             lambda q, d, oid: self._order_action(int(oid), q)),
+        ]
+        return exact, param
+
+    # ========== 統計 (帶緩存) ==========
+    def _get_stats_cached(self):
+        cached = self.cache.get("stats")
+        if cached:
+            return cached
+        # single-flight：未命中時只讓一個線程回填，其餘等結果
+        with self._stats_lock:
+            cached = self.cache.get("stats")
             if cached:
                 return cached
             stats = self.repo.get_stats()
-            self.cache.set(cache_key, stats)
+            # stats 聚合同時依賴三張表，任何一張的寫都應讓它失效
+            self.cache.set("stats", stats, tags=("orders", "cleaners", "properties"))
             return stats
-        
-        # Cleaner stats
-        if path == "/api/cleaner/stats":
-            if method == "GET":
-                cleaner_id = query.get("cleaner_id", [None])[0]
-                if cleaner_id:
-                    return self.repo.get_cleaner_stats(int(cleaner_id))
-            return {"error": "Missing cleaner_id"}
-        
-        # ========== 地址 geocoding ==========
-        if path == "/api/geocode":
-            if method == "GET":
-                address = query.get("address", [""])[0]
-                if address:
-                    return self._geocode_address(address)
-                return {"error": "Missing address"}
-        
-        # ========== 房源 ==========
-        if path == "/api/properties":
-            if method == "GET":
-                status = query.get("status", ["active"])[0]
-                return {"data": [self._property_to_dict(p) for p in self.repo.get_properties(status)]}
-            elif method == "POST":
-                return self._add_property(json.loads(body) if body else {})
-        
-        if path.startswith("/api/properties/"):
-            try:
-                prop_id = int(path.split("/")[-1])
-            except ValueError:
-                return {"error": "Invalid property ID", "code": 400}
-            if method == "GET":
-                prop = self.repo.get_property(prop_id)
-                return {"data": self._property_to_dict(prop)} if prop else {"error": "Not found", "code": 404}
-        
-        # ========== 清點工 ==========
-        if path == "/api/cleaners":
-            if method == "GET":
-                status = query.get("status", ["available"])[0]
-                return {"data": [self._cleaner_to_dict(c) for c in self.repo.get_cleaners(status)]}
-            elif method == "POST":
-                return self._add_cleaner(json.loads(body) if body else {})
-        
-        # ========== 清點工 CRUD ==========
-        if path.startswith("/api/cleaners/") and method == "GET":
-            parts = path.split("/")
-            if len(parts) >= 4:
-                try:
-                    cleaner_id = int(parts[3])
-                    return self._get_cleaner(cleaner_id)
-                except ValueError:
-                    return {"error": "Invalid cleaner ID", "code": 400}
-        
-        # ========== 房東 CRUD ==========
-        if path == "/api/hosts/login":
-            if method == "POST":
-                return self._host_login(json.loads(body) if body else {})
-        
-        # 房東驗證碼登錄
-        if path.startswith("/api/hosts/code/") and method == "GET":
-            code = path.split("/")[-1]
-            return self._host_login_by_code(code)
-        
-        if path == "/api/hosts":
-            if method == "GET":
-                return self._get_hosts()
-            elif method == "POST":
-                return self._add_host(json.loads(body) if body else {})
-        
-        if path.startswith("/api/hosts/") and method == "GET":
-            parts = path.split("/")
-            if len(parts) >= 4:
-                try:
-                    host_id = int(parts[3])
-                    return self._get_host(host_id)
-                except ValueError:
-                    return {"error": "Invalid host ID", "code": 400}
-        
-        if path.startswith("/api/hosts/") and method == "PUT":
-            parts = path.split("/")
-            if len(parts) >= 4:
-                try:
-                    host_id = int(parts[3])
-                    return self._update_host(host_id, json.loads(body) if body else {})
-                except ValueError:
-                    return {"error": "Invalid host ID", "code": 400}
-        
-        # ========== 房源 CRUD ==========
-        if path == "/api/properties" and method == "POST":
-            return self._add_property(json.loads(body) if body else {})
-        
-        if path.startswith("/api/properties/") and method == "PUT":
-            parts = path.split("/")
-            if len(parts) >= 4:
-                try:
-                    prop_id = int(parts[3])
-                    return self._update_property(prop_id, json.loads(body) if body else {})
-                except ValueError:
-                    return {"error": "Invalid property ID", "code": 400}
-        
-        if path.startswith("/api/properties/") and method == "DELETE":
-            parts = path.split("/")
-            if len(parts) >= 4:
-                try:
-                    prop_id = int(parts[3])
-                    return self._delete_property(prop_id)
-                except ValueError:
-                    return {"error": "Invalid property ID", "code": 400}
-        
-        if path.startswith("/api/hosts/") and method == "DELETE":
-            parts = path.split("/")
-            if len(parts) >= 4:
-                try:
-                    host_id = int(parts[3])
-                    return self._delete_host(host_id)
-                except ValueError:
-                    return {"error": "Invalid host ID", "code": 400}
-        
-        if path.startswith("/api/cleaners/") and method == "PUT":
-            parts = path.split("/")
-            if len(parts) >= 4:
-                try:
-                    cleaner_id = int(parts[3])
-                    return self._update_cleaner(cleaner_id, json.loads(body) if body else {})
-                except ValueError:
-                    return {"error": "Invalid cleaner ID", "code": 400}
-        
-        if path.startswith("/api/cleaners/") and method == "DELETE":
-            parts = path.split("/")
-            if len(parts) >= 4:
-                try:
-                    cleaner_id = int(parts[3])
-                    return self._delete_cleaner(cleaner_id)
-                except ValueError:
-                    return {"error": "Invalid cleaner ID", "code": 400}
-        
-        # ========== 訂單 ==========
-        if path == "/api/orders":
-            if method == "GET":
-                status = query.get("status", [None])[0]
-                page = int(query.get("page", ["1"])[0])
-                limit = int(query.get("limit", ["20"])[0])
-                return self._get_orders(status, page, limit)
-            elif method == "POST":
-                return self._create_order(json.loads(body) if body else {})
-        
-        # 獲取單個訂單
-        if path.startswith("/api/orders/") and not any(x in path for x in ["/verify-accept", "/complete", "/cancel"]):
-            parts = path.split("/")
-            if len(parts) >= 4:
-                try:
-                    order_id = int(parts[3])
-                    if method == "GET":
-                        conn = self.db._get_connection()
-                        conn.row_factory = sqlite3.Row
-                        cursor = conn.cursor()
-                        cursor.execute("""
-                            SELECT o.*, p.name as property_name, p.address as property_address,
-                                   p.province as property_province, p.city as property_city,
-                                   p.street as property_street, p.house_number as property_house_number
-                            FROM orders o
-                            LEFT JOIN properties p ON o.property_id = p.id
-                            WHERE o.id = ?
-                        """, (order_id,))
-                        row = cursor.fetchone()
-                        conn.close()
-                        if row:
-                            return {"data": dict(row)}
-                        else:
-                            return {"error": "Order not found", "code": 404}
-                except:
-                    pass
-        
-        # 驗證接單 code
-        if path.startswith("/api/orders/") and path.endswith("/verify-accept"):
-            parts = path.split("/")
-            if len(parts) >= 4:
-                try:
-                    order_id = int(parts[3])
-                    return self._verify_accept_order(order_id, json.loads(body) if body else {})
-                except:
-                    pass
-        
-        # 訂單 PUT/DELETE
-        if path.startswith("/api/orders/") and method == "PUT":
-            parts = path.split("/")
-            if len(parts) >= 4:
-                try:
-                    order_id = int(parts[3])
-                    data = json.loads(body) if body else {}
-                    print(f"PUT /orders/{order_id}, body keys: {list(data.keys())}")
-                    return self._update_order(order_id, data)
-                except Exception as e:
-                    print(f"Error in PUT: {e}")
-                    pass
-        
-        if path.startswith("/api/orders/") and method == "DELETE":
-            parts = path.split("/")
-            if len(parts) >= 4:
-                try:
-                    order_id = int(parts[3])
-                    return self._delete_order(order_id)
-                except:
-                    pass
-        
-        if path.startswith("/api/orders/"):
-            parts = path.split("/")
-            if len(parts) >= 4:
-                try:
-                    order_id = int(parts[3])
-                    if method == "POST":
-                        action = query.get("action", [None])[0]
-                        if action == "complete":
-                            return self._complete_order(order_id)
-                        elif action == "cancel":
-                            return self._cancel_order(order_id)
-                except:
-                    pass
-        
+
+    def _get_cleaner_stats(self, query):
+        cleaner_id = query.get("cleaner_id", "")
+        if cleaner_id.isdigit():
+            return self.repo.get_cleaner_stats(int(cleaner_id))
+        return {"error": "Missing cleaner_id"}
+
+    def _geocode_route(self, query):
+        address = query.get("address", "")
+        if address:
+            return self._geocode_address(address)
+        return {"error": "Missing address"}
+
+    def _list_properties(self, query):
+        status = query.get("status", "active")
+        return {"data": [self._property_to_dict(p) for p in self.repo.get_properties(status)]}
+
+    def _get_property_route(self, prop_id):
+        prop = self.repo.get_property(prop_id)
+        return {"data": self._property_to_dict(prop)} if prop else {"error": "Not found", "code": 404}
+
+    def _list_cleaners(self, query):
+        status = query.get("status", "available")
+        return {"data": [self._cleaner_to_dict(c) for c in self.repo.get_cleaners(status)]}
+
+    def _list_orders(self, query):
+        page = query.get("page", "1")
+        limit = query.get("limit", "20")
+        # isdigit 先驗證，int() 就不可能拋異常
+        if not page.isdigit() or not limit.isdigit():
+            return {"error": "Invalid page/limit", "code": 400}
+        return self._get_orders(query.get("status"), int(page), int(limit))
+
+    # 獲取單個訂單（和列表共用同一個投影）
+    def _get_order(self, order_id):
+        with self.pool.acquire(readonly=True) as conn:
+            cur = conn.exec(_ORDER_SELECT + " WHERE o.id = ?", (order_id,))
+            cur.row_factory = None
+            row = cur.fetchone()
+        if row:
+            return {"data": dict(zip(_ORDER_COLS, row))}
+        return {"error": "Order not found", "code": 404}
+
+    def _order_action(self, order_id, query):
+        action = query.get("action")
+        if action == "complete":
+            return self._complete_order(order_id)
+        if action == "cancel":
+            return self._cancel_order(order_id)
         return {"error": "Not Found", "code": 404}
     
     def _geocode_address(self, address: str) -> Dict[str, Any]:
+        """地址解析，帶內存 + SQLite 兩級緩存（命中免去整個 HTTPS 往返）"""
+        key = hashlib.blake2b(address.strip().lower().encode(), digest_size=16).digest()
+
+        cached = self._geo_mem.get(key)
+        if cached:
+            return cached
+
+        with self.pool.acquire(readonly=True) as conn:
+            row = conn.exec("SELECT json FROM geocode_cache WHERE key = ?", (key,)).fetchone()
+        if row:
+            result = _loads(row[0])
+            self._remember_geocode(key, result)
+            return result
+
+        # 請求線程最多等 2 秒；上游再慢也只佔用 geocode 池裡的線程
+        future = self._geo_pool.submit(self._geocode_remote, address)
+        try:
+            result = future.result(timeout=2)
+        except FutureTimeoutError:
+            return {"error": "Geocode timeout", "code": 504}
+        if result.get("success"):
+            with self.pool.acquire() as conn:
+                conn.exec("INSERT OR REPLACE INTO geocode_cache (key, json) VALUES (?, ?)",
+                          (key, _dumps(result)))
+                conn.commit()
+            self._remember_geocode(key, result)
+        return result
+
+    def _remember_geocode(self, key, result):
+        if len(self._geo_mem) >= _GEO_CACHE_MAX:
+            self._geo_mem.clear()
+        self._geo_mem[key] = result
+
+    def _geocode_remote(self, address: str) -> Dict[str, Any]:
         """使用 Nominatim (OpenStreetMap) 進行地址解析"""
         import urllib.request
         import urllib.parse
@@ -399,7 +483,8 @@ class CleaningAPI:
             })
             
             with urllib.request.urlopen(req, timeout=10) as response:
-                data = json.loads(response.read().decode('utf-8'))
+                # _loads 直接吃 bytes，省掉先 decode 再掃一遍的開銷
+                data = _loads(response.read())
             
             if not data:
                 return {"error": "無法找到該地址", "code": 404}
@@ -431,17 +516,18 @@ class CleaningAPI:
     def _property_to_dict(self, prop):
         if not prop:
             return {}
+        # Property 的 __slots__ 保證所有字段都已賦值，直接取屬性即可
         return {
             "id": prop.id, "name": prop.name, "address": prop.address,
-            "postal_code": getattr(prop, 'postal_code', ''),
+            "postal_code": prop.postal_code,
             "bedrooms": prop.bedrooms, "bathrooms": prop.bathrooms,
-            "floor": getattr(prop, 'floor', 0),
-            "area": getattr(prop, 'area', 0),
-            "province": getattr(prop, 'province', ''),
-            "city": getattr(prop, 'city', ''),
-            "street": getattr(prop, 'street', ''),
-            "house_number": getattr(prop, 'house_number', ''),
-            "host_phone": getattr(prop, 'host_phone', ''),
+            "floor": prop.floor,
+            "area": prop.area,
+            "province": prop.province,
+            "city": prop.city,
+            "street": prop.street,
+            "house_number": prop.house_number,
+            "host_phone": prop.host_phone,
             "cleaning_time_minutes": prop.cleaning_time_minutes
         }
     
@@ -451,7 +537,7 @@ class CleaningAPI:
         return {
             "id": cleaner.id, "name": cleaner.name, "phone": cleaner.phone,
             "status": cleaner.status, "rating": cleaner.rating, "total_jobs": cleaner.total_jobs,
-            "code": getattr(cleaner, 'code', None)
+            "code": cleaner.code
         }
     
     def _add_cleaner(self, data):
@@ -459,125 +545,104 @@ class CleaningAPI:
             return {"error": "name required", "code": 400}
         
         phone = data.get("phone", "")
-        # 檢查電話是否已存在
-        conn = self.db._get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT id FROM cleaners WHERE phone = ?", (phone,))
-        if cursor.fetchone():
-            conn.close()
-            return {"error": "電話號碼已存在", "code": 400}
-        cursor.execute("SELECT id FROM hosts WHERE phone = ?", (phone,))
-        if cursor.fetchone():
-            conn.close()
-            return {"error": "電話號碼已被房東使用", "code": 400}
-        
-        # 生成唯一驗證碼
-        while True:
-            code = str(random.randint(100000, 999999))
-            cursor.execute("SELECT id FROM cleaners WHERE code = ?", (code,))
-            if not cursor.fetchone():
-                cursor.execute("SELECT id FROM hosts WHERE code = ?", (code,))
-                if not cursor.fetchone():
-                    break
-        
-        cleaner = Cleaner(name=data["name"], phone=phone, email=data.get("email", ""))
-        cleaner_id = self.repo.add_cleaner(cleaner)
-        
-        # 更新 code
-        cursor.execute("UPDATE cleaners SET code = ? WHERE id = ?", (code, cleaner_id))
-        conn.commit()
-        conn.close()
-        
+        with self.pool.acquire() as conn:
+            cursor = conn.cursor()
+            # 檢查電話是否已存在（兩張表合成一條語句）
+            cursor.execute("""
+                SELECT 'cleaner' FROM cleaners WHERE phone = ?
+                UNION ALL SELECT 'host' FROM hosts WHERE phone = ? LIMIT 1
+            """, (phone, phone))
+            row = cursor.fetchone()
+            if row:
+                if row[0] == 'cleaner':
+                    return {"error": "電話號碼已存在", "code": 400}
+                return {"error": "電話號碼已被房東使用", "code": 400}
+
+            # 驗證碼直接插入，撞到唯一索引就重試，不再先 SELECT 探測
+            for _ in range(5):
+                code = new_code()
+                cursor.execute("SELECT 1 FROM hosts WHERE code = ?", (code,))
+                if cursor.fetchone():
+                    continue  # 與房東 code 衝突
+                cleaner = Cleaner(name=data["name"], phone=phone, email=data.get("email", ""), code=code)
+                try:
+                    cleaner_id = self.repo.add_cleaner(cleaner)
+                except sqlite3.IntegrityError:
+                    continue  # 與其他清潔工 code 衝突
+                break
+            else:
+                return {"error": "驗證碼生成失敗，請重試", "code": 500}
+
+        self.cache.invalidate_tag("cleaners")
         return {"data": {"id": cleaner_id, "code": code}, "message": "Cleaner added with code"}
     
     def _get_cleaner(self, cleaner_id):
-        conn = self.db._get_connection()
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM cleaners WHERE id = ?", (cleaner_id,))
-        row = cursor.fetchone()
-        conn.close()
+        with self.pool.acquire(readonly=True) as conn:
+            row = conn.exec("""SELECT id, name, phone, email, status, rating, total_jobs, created_at, code
+                               FROM cleaners WHERE id = ?""", (cleaner_id,)).fetchone()
         if row:
             return {"data": dict(row)}
         return {"error": "Not found", "code": 404}
-    
+
     def _update_cleaner(self, cleaner_id, data):
-        conn = self.db._get_connection()
-        cursor = conn.cursor()
-        updates = []
-        params = []
-        if data.get("name"):
-            updates.append("name = ?")
-            params.append(data["name"])
-        if data.get("phone"):
-            updates.append("phone = ?")
-            params.append(data["phone"])
-        if data.get("status"):
-            updates.append("status = ?")
-            params.append(data["status"])
-        
-        if updates:
-            params.append(cleaner_id)
-            cursor.execute(f"UPDATE cleaners SET {', '.join(updates)} WHERE id = ?", params)
-            conn.commit()
-        conn.close()
+        fields = tuple(f for f in _CLEANER_FIELDS if data.get(f))
+        if fields:
+            params = [data[f] for f in fields] + [cleaner_id]
+            with self.pool.transaction() as conn:
+                conn.exec(_update_sql("cleaners", fields), params)
+            self.cache.invalidate_tag("cleaners")
         return {"message": "Cleaner updated"}
-    
+
     def _delete_cleaner(self, cleaner_id):
-        conn = self.db._get_connection()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM cleaners WHERE id = ?", (cleaner_id,))
-        conn.commit()
-        conn.close()
+        with self.pool.acquire() as conn:
+            conn.execute("DELETE FROM cleaners WHERE id = ?", (cleaner_id,))
+            conn.commit()
+        self.cache.invalidate_tag("cleaners")
         return {"message": "Cleaner deleted"}
-    
+
     # ========== 房東 ==========
     def _get_hosts(self):
-        conn = self.db._get_connection()
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM hosts ORDER BY id")
-        rows = cursor.fetchall()
-        conn.close()
-        return {"data": [dict(r) for r in rows]}
-    
+        with self.pool.acquire(readonly=True) as conn:
+            conn.execute("BEGIN DEFERRED")
+            try:
+                cur = conn.exec("SELECT id, name, phone, code, created_at FROM hosts ORDER BY id")
+                cur.row_factory = None  # 裸 tuple，省掉每行的 Row 包裝
+                rows = cur.fetchall()
+            finally:
+                conn.commit()
+        return {"data": [
+            {"id": i, "name": n, "phone": p, "code": c, "created_at": t}
+            for (i, n, p, c, t) in rows
+        ]}
+
     def _host_login(self, data):
         phone = data.get("phone")
         if not phone:
             return {"error": "phone required", "code": 400}
-        
-        conn = self.db._get_connection()
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM hosts WHERE phone = ?", (phone,))
-        row = cursor.fetchone()
-        conn.close()
-        
-        if row:
-            return {"data": {"id": row["id"], "name": row["name"], "phone": row["phone"], "code": row["code"]}, "message": "Login success"}
-        
-        # 自动注册
-        code = str(random.randint(100000, 999999))
-        conn = self.db._get_connection()
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO hosts (name, phone, code) VALUES (?, ?, ?)", 
-                       (data.get("name", "房東"), phone, code))
-        host_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return {"data": {"id": host_id, "code": code}, "message": "Registered"}
-    
+
+        # 登錄或自動注冊：UPSERT 省掉注冊路徑上的 SELECT+INSERT 兩次往返
+        code = new_code()
+        with self.pool.acquire() as conn:
+            row = conn.exec("""
+                INSERT INTO hosts (name, phone, code, code_hash) VALUES (?, ?, ?, ?)
+                ON CONFLICT(phone) DO NOTHING
+                RETURNING id, code
+            """, (data.get("name", "房東"), phone, code, hash_code(code))).fetchone()
+            if row:
+                conn.commit()
+                return {"data": {"id": row["id"], "code": row["code"]}, "message": "Registered"}
+            # 衝突分支也要結束 INSERT 開出的（空）事務
+            conn.commit()
+            row = conn.exec("SELECT id, name, phone, code FROM hosts WHERE phone = ?", (phone,)).fetchone()
+        return {"data": {"id": row["id"], "name": row["name"], "phone": row["phone"], "code": row["code"]}, "message": "Login success"}
+
     def _host_login_by_code(self, code):
         if not code:
             return {"error": "code required", "code": 400}
-        
-        conn = self.db._get_connection()
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM hosts WHERE code = ?", (code,))
-        row = cursor.fetchone()
-        conn.close()
-        
+
+        with self.pool.acquire(readonly=True) as conn:
+            row = conn.exec("SELECT * FROM hosts WHERE code_hash = ?", (hash_code(code),)).fetchone()
+
         if row:
             return {"data": {"id": row["id"], "name": row["name"], "phone": row["phone"], "code": row["code"]}, "message": "Login success"}
         
@@ -588,71 +653,58 @@ class CleaningAPI:
             return {"error": "name and phone required", "code": 400}
         
         phone = data.get("phone")
-        # 檢查電話是否已存在
-        conn = self.db._get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT id FROM hosts WHERE phone = ?", (phone,))
-        if cursor.fetchone():
-            conn.close()
-            return {"error": "電話號碼已存在", "code": 400}
-        cursor.execute("SELECT id FROM cleaners WHERE phone = ?", (phone,))
-        if cursor.fetchone():
-            conn.close()
-            return {"error": "電話號碼已被清潔夥伴使用", "code": 400}
-        
-        # 生成唯一驗證碼
-        while True:
-            code = str(random.randint(100000, 999999))
-            cursor.execute("SELECT id FROM cleaners WHERE code = ?", (code,))
-            if not cursor.fetchone():
-                cursor.execute("SELECT id FROM hosts WHERE code = ?", (code,))
-                if not cursor.fetchone():
-                    break
-        
-        cursor.execute("INSERT INTO hosts (name, phone, code) VALUES (?, ?, ?)", 
-                     (data["name"], phone, code))
-        host_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        
+        with self.pool.acquire() as conn:
+            cursor = conn.cursor()
+            # 檢查電話是否已存在（兩張表合成一條語句）
+            cursor.execute("""
+                SELECT 'host' FROM hosts WHERE phone = ?
+                UNION ALL SELECT 'cleaner' FROM cleaners WHERE phone = ? LIMIT 1
+            """, (phone, phone))
+            row = cursor.fetchone()
+            if row:
+                if row[0] == 'host':
+                    return {"error": "電話號碼已存在", "code": 400}
+                return {"error": "電話號碼已被清潔夥伴使用", "code": 400}
+
+            # 驗證碼直接插入，撞到唯一索引就重試，不再先 SELECT 探測
+            for _ in range(5):
+                code = new_code()
+                cursor.execute("SELECT 1 FROM cleaners WHERE code = ?", (code,))
+                if cursor.fetchone():
+                    continue  # 與清潔工 code 衝突
+                try:
+                    cursor.execute("INSERT INTO hosts (name, phone, code, code_hash) VALUES (?, ?, ?, ?)",
+                                   (data["name"], phone, code, hash_code(code)))
+                except sqlite3.IntegrityError:
+                    continue  # 與其他房東 code 衝突
+                host_id = cursor.lastrowid
+                conn.commit()
+                break
+            else:
+                return {"error": "驗證碼生成失敗，請重試", "code": 500}
+
         return {"data": {"id": host_id, "code": code}, "message": "Host added"}
-    
+
     def _get_host(self, host_id):
-        conn = self.db._get_connection()
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM hosts WHERE id = ?", (host_id,))
-        row = cursor.fetchone()
-        conn.close()
+        with self.pool.acquire(readonly=True) as conn:
+            row = conn.exec("SELECT id, name, phone, code, created_at FROM hosts WHERE id = ?",
+                            (host_id,)).fetchone()
         if row:
             return {"data": dict(row)}
         return {"error": "Not found", "code": 404}
-    
+
     def _update_host(self, host_id, data):
-        conn = self.db._get_connection()
-        cursor = conn.cursor()
-        updates = []
-        params = []
-        if data.get("name"):
-            updates.append("name = ?")
-            params.append(data["name"])
-        if data.get("phone"):
-            updates.append("phone = ?")
-            params.append(data["phone"])
-        
-        if updates:
-            params.append(host_id)
-            cursor.execute(f"UPDATE hosts SET {', '.join(updates)} WHERE id = ?", params)
-            conn.commit()
-        conn.close()
+        fields = tuple(f for f in _HOST_FIELDS if data.get(f))
+        if fields:
+            params = [data[f] for f in fields] + [host_id]
+            with self.pool.transaction() as conn:
+                conn.exec(_update_sql("hosts", fields), params)
         return {"message": "Host updated"}
-    
+
     def _delete_host(self, host_id):
-        conn = self.db._get_connection()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM hosts WHERE id = ?", (host_id,))
-        conn.commit()
-        conn.close()
+        with self.pool.acquire() as conn:
+            conn.execute("DELETE FROM hosts WHERE id = ?", (host_id,))
+            conn.commit()
         return {"message": "Host deleted"}
     
     # ========== 房源管理 ==========
@@ -662,109 +714,103 @@ class CleaningAPI:
         
         # 獲取經緯度
         lat, lon = geocode_address(data.get("address", ""))
-        
-        conn = self.db._get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""INSERT INTO properties (name, address, bedrooms, bathrooms, cleaning_time_minutes, cleaning_checklist, notes, status, created_at, floor, area, province, city, street, house_number, host_phone, postal_code, latitude, longitude)
-                          VALUES (?, ?, ?, ?, ?, ?, ?, 'active', datetime('now'), ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                     (data.get("name"), data.get("address"),
-                      data.get("bedrooms", 1), data.get("bathrooms", 1),
-                      data.get("cleaning_time_minutes", 120), 
-                      data.get("cleaning_checklist", ""), data.get("notes", ""),
-                      data.get("floor", 0), data.get("area", 0),
-                      data.get("province", ""), data.get("city", ""),
-                      data.get("street", ""), data.get("house_number", ""),
-                      data.get("host_phone", ""),
-                      data.get("postal_code", ""),
-                      lat, lon))
-        prop_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+
+        with self.pool.acquire() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""INSERT INTO properties (name, address, bedrooms, bathrooms, cleaning_time_minutes, cleaning_checklist, notes, status, created_at, floor, area, province, city, street, house_number, host_phone, postal_code, latitude, longitude)
+                              VALUES (?, ?, ?, ?, ?, ?, ?, 'active', datetime('now'), ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                         (data.get("name"), data.get("address"),
+                          data.get("bedrooms", 1), data.get("bathrooms", 1),
+                          data.get("cleaning_time_minutes", 120),
+                          data.get("cleaning_checklist", ""), data.get("notes", ""),
+                          data.get("floor", 0), data.get("area", 0),
+                          data.get("province", ""), data.get("city", ""),
+                          data.get("street", ""), data.get("house_number", ""),
+                          data.get("host_phone", ""),
+                          data.get("postal_code", ""),
+                          lat, lon))
+            prop_id = cursor.lastrowid
+            conn.commit()
+        self.cache.invalidate_tag("properties")
         return {"data": {"id": prop_id, "latitude": lat, "longitude": lon}, "message": "Property added"}
     
     def _update_property(self, prop_id, data):
-        conn = self.db._get_connection()
-        cursor = conn.cursor()
-        updates = []
-        params = []
-        
-        for field in ["name", "address", "postal_code", "bedrooms", "bathrooms", "floor", "area", 
-                      "province", "city", "street", "house_number", "host_phone",
-                      "cleaning_time_minutes", "cleaning_checklist", "notes"]:
-            if data.get(field) is not None:
-                updates.append(f"{field} = ?")
-                params.append(data[field])
-        
+        fields = [f for f in _PROPERTY_FIELDS if data.get(f) is not None]
+        params = [data[f] for f in fields]
+
         # 如果地址變更，重新獲取經緯度
         if data.get("address"):
             lat, lon = geocode_address(data["address"])
-            updates.append("latitude = ?")
-            params.append(lat)
-            updates.append("longitude = ?")
-            params.append(lon)
-        
-        if updates:
+            fields += ["latitude", "longitude"]
+            params += [lat, lon]
+
+        if fields:
             params.append(prop_id)
-            cursor.execute(f"UPDATE properties SET {', '.join(updates)} WHERE id = ?", params)
-            conn.commit()
-        conn.close()
+            with self.pool.transaction() as conn:
+                conn.exec(_update_sql("properties", tuple(fields)), params)
         return {"message": "Property updated"}
-    
+
     def _delete_property(self, prop_id):
-        conn = self.db._get_connection()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM properties WHERE id = ?", (prop_id,))
-        conn.commit()
-        conn.close()
+        with self.pool.acquire() as conn:
+            conn.execute("DELETE FROM properties WHERE id = ?", (prop_id,))
+            conn.commit()
+        self.cache.invalidate_tag("properties")
         return {"message": "Property deleted"}
-    
+
     def _get_orders(self, status=None, page=1, limit=20):
-        conn = self.db._get_connection()
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
         # 查詢條件
         query_where = "WHERE 1=1"
         params = []
         if status:
             query_where += " AND o.status = ?"
             params.append(status)
-        
-        # 獲取總數
-        count_sql = f"SELECT COUNT(*) as total FROM orders o {query_where}"
-        cursor.execute(count_sql, params)
-        total = cursor.fetchone()["total"]
-        
+
         # 分頁
         offset = (page - 1) * limit
         query = f"""
-            SELECT o.*, p.name as property_name, p.address as property_address,
-                   p.province as property_province, p.city as property_city,
-                   p.street as property_street, p.house_number as property_house_number,
-                   p.latitude as property_latitude, p.longitude as property_longitude,
-                   c.name as cleaner_name
-            FROM orders o
-            LEFT JOIN properties p ON o.property_id = p.id
-            LEFT JOIN cleaners c ON o.assigned_cleaner_id = c.id
+            {_ORDER_SELECT}
             {query_where}
             ORDER BY o.checkout_time ASC
             LIMIT ? OFFSET ?
         """
-        params.extend([limit, offset])
-        
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        conn.close()
-        
-        return {
-            "data": [dict(row) for row in rows],
-            "pagination": {
-                "page": page,
-                "limit": limit,
-                "total": total,
-                "pages": (total + limit - 1) // limit
-            }
-        }
+
+        # 生成器邊取邊發：響應的 JSON 形狀不變，但字節直接流向 socket，
+        # 峰值內存只有一個 fetchmany 批次
+        def stream():
+            with self.pool.acquire(readonly=True) as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = None
+
+                # 同一個讀事務裡取總數和分頁，快照保持一致
+                conn.execute("BEGIN DEFERRED")
+                try:
+                    count_sql = f"SELECT COUNT(*) FROM orders o {query_where}"
+                    cursor.execute(count_sql, params)
+                    total = cursor.fetchone()[0]
+
+                    cursor.execute(query, params + [limit, offset])
+                    cursor.arraysize = 1000
+                    yield b'{"data":['
+                    first = True
+                    while True:
+                        chunk = cursor.fetchmany()
+                        if not chunk:
+                            break
+                        if not first:
+                            yield b","
+                        yield b",".join(_dumps(dict(zip(_ORDER_COLS, row))) for row in chunk)
+                        first = False
+                    pagination = {
+                        "page": page,
+                        "limit": limit,
+                        "total": total,
+                        "pages": (total + limit - 1) // limit
+                    }
+                    yield b'],"pagination":' + _dumps(pagination) + b'}'
+                finally:
+                    conn.commit()
+
+        return {"stream": stream()}
     
     def _create_order(self, data):
         # 驗證請求數據
@@ -778,28 +824,25 @@ class CleaningAPI:
             if not self.idempotency.check(idempotency_key):
                 return {"error": "Duplicate request", "code": 409}
         
-        # 驗證房源存在
-        conn = self.db._get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT id FROM properties WHERE id = ?", (data.get("property_id"),))
-        if not cursor.fetchone():
-            conn.close()
-            return {"error": "Property not found", "code": 404}
-        
-        
-        cursor.execute("""
-            INSERT INTO orders (property_id, host_name, host_phone, checkout_time, price, status, voice_url, text_notes)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (data.get("property_id"), data.get("host_name", ""), data.get("host_phone", ""),
-              data.get("checkout_time"), data.get("price", 100), "open", 
-              data.get("voice_url"), data.get("text_notes")))
-        
-        order_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        
-        # 清除緩存
-        self.cache.clear()
+        with self.pool.acquire() as conn:
+            cursor = conn.cursor()
+            # 驗證房源存在
+            cursor.execute("SELECT id FROM properties WHERE id = ?", (data.get("property_id"),))
+            if not cursor.fetchone():
+                return {"error": "Property not found", "code": 404}
+
+            cursor.execute("""
+                INSERT INTO orders (property_id, host_name, host_phone, checkout_time, price, status, voice_url, text_notes)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (data.get("property_id"), data.get("host_name", ""), data.get("host_phone", ""),
+                  data.get("checkout_time"), data.get("price", 100), "open",
+                  data.get("voice_url"), data.get("text_notes")))
+
+            order_id = cursor.lastrowid
+            conn.commit()
+
+        # 只失效受訂單影響的緩存
+        self.cache.invalidate_tag("orders")
         
         return {"data": {"id": order_id}, "message": "Order created"}
     
@@ -817,197 +860,147 @@ class CleaningAPI:
         except ValueError:
             return {"error": "Invalid cleaner_id", "code": 400}
         
-        # 驗證清潔工
-        conn = self.db._get_connection()
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT code FROM cleaners WHERE id = ?", (cleaner_id,))
-        row = cursor.fetchone()
-        conn.close()
-        
+        # 驗證碼只比對 keyed hash
+        with self.pool.acquire(readonly=True) as conn:
+            row = conn.exec("SELECT code_hash FROM cleaners WHERE id = ?", (cleaner_id,)).fetchone()
         if not row:
             return {"error": "Cleaner not found", "code": 404}
-        
-        if str(row["code"]) != str(code):
+        if not verify_code(code, row["code_hash"]):
             return {"error": "Invalid code", "code": 400}
-        
-        # 高並發保護：使用鎖表實現互斥
-        conn = self.db._get_connection()
-        cursor = conn.cursor()
-        
-        # 嘗試獲取鎖（原子操作）
-        cursor.execute("INSERT OR IGNORE INTO order_locks (order_id) VALUES (?)", (order_id,))
-        if cursor.rowcount == 0:
-            # 已經被鎖定
-            conn.close()
-            return {"error": "Order already being processed", "code": 409}
-        
-        try:
-            # 檢查訂單狀態
-            cursor.execute("SELECT status FROM orders WHERE id = ?", (order_id,))
-            row = cursor.fetchone()
-            if not row:
-                conn.execute("DELETE FROM order_locks WHERE order_id = ?", (order_id,))
-                conn.commit()
-                conn.close()
-                return {"error": "Order not found", "code": 404}
-            
-            if row[0] != 'open':
-                conn.execute("DELETE FROM order_locks WHERE order_id = ?", (order_id,))
-                conn.commit()
-                conn.close()
-                return {"error": f"Order already taken (status: {row[0]})", "code": 409}
-            
-            # 執行搶單
-            cursor.execute("""
-                UPDATE orders 
-                SET assigned_cleaner_id = ?, status = 'accepted', assigned_at = CURRENT_TIMESTAMP
-                WHERE id = ? AND status = 'open'
-            """, (cleaner_id, order_id))
-            
-            # 確認更新成功
-            cursor.execute("SELECT status, assigned_cleaner_id FROM orders WHERE id = ?", (order_id,))
-            result = cursor.fetchone()
-            
-            if result and result[0] == 'accepted' and result[1] == cleaner_id:
-                conn.commit()
+
+        # 單條原子 UPDATE：status='open' 條件就是搶單互斥，
+        # SQLite 自己串行化寫入，不需要鎖表和確認 SELECT；
+        # BEGIN IMMEDIATE 直接拿寫鎖，省掉 deferred 升級
+        with self.pool.transaction() as conn:
+            if _HAS_RETURNING:
+                # RETURNING 讓成功路徑在同一條語句裡拿到 assigned_at
+                accepted = conn.exec("""
+                    UPDATE orders
+                    SET assigned_cleaner_id = ?, status = 'accepted', assigned_at = CURRENT_TIMESTAMP
+                    WHERE id = ? AND status = 'open'
+                    RETURNING assigned_at
+                """, (cleaner_id, order_id)).fetchone()
             else:
-                conn.execute("DELETE FROM order_locks WHERE order_id = ?", (order_id,))
-                conn.commit()
-                conn.close()
-                return {"error": "Failed to grab order", "code": 409}
-            
-            # 釋放鎖
-            conn.execute("DELETE FROM order_locks WHERE order_id = ?", (order_id,))
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            try:
-                conn.execute("DELETE FROM order_locks WHERE order_id = ?", (order_id,))
-                conn.commit()
-            except:
-                pass
-            conn.close()
-            return {"error": str(e), "code": 500}
-        
-        conn.close()
-        
+                cur = conn.exec("""
+                    UPDATE orders
+                    SET assigned_cleaner_id = ?, status = 'accepted', assigned_at = CURRENT_TIMESTAMP
+                    WHERE id = ? AND status = 'open'
+                """, (cleaner_id, order_id))
+                accepted = cur.rowcount == 1
+            if not accepted:
+                # CAS 沒命中：再查一次只為了區分 404 / 409
+                row = conn.exec("SELECT status FROM orders WHERE id = ?", (order_id,)).fetchone()
+                if not row:
+                    return {"error": "Order not found", "code": 404}
+                return {"error": f"Order already taken (status: {row[0]})", "code": 409}
+
         # 清除緩存
-        self.cache.clear()
-        
-        return {"message": "Order accepted", "verified": True}
+        self.cache.invalidate_tag("orders")
+
+        result = {"message": "Order accepted", "verified": True}
+        if _HAS_RETURNING:
+            result["assigned_at"] = accepted["assigned_at"]
+        return result
     
     def _complete_order(self, order_id):
-        conn = self.db._get_connection()
-        cursor = conn.cursor()
-        cursor.execute("UPDATE orders SET status = 'completed' WHERE id = ?", (order_id,))
-        conn.commit()
-        conn.close()
+        with self.pool.acquire() as conn:
+            conn.execute("UPDATE orders SET status = 'completed' WHERE id = ?", (order_id,))
+            conn.commit()
+        self.cache.invalidate_tag("orders")
         return {"message": "Order completed"}
     
     def _update_order(self, order_id, data):
-        
-        # 驗證 status 值
-        valid_statuses = ["open", "accepted", "arrived", "completed", "cancelled"]
-        if data.get("status") and data["status"] not in valid_statuses:
-            return {"error": f"Invalid status. Must be one of: {', '.join(valid_statuses)}", "code": 400}
-        
-        # 驗證 price
-        if data.get("price"):
-            try:
-                price = float(data["price"])
-                if price <= 0:
-                    return {"error": "Price must be greater than 0", "code": 400}
-            except (ValueError, TypeError):
-                return {"error": "Invalid price", "code": 400}
-        
-        conn = self.db._get_connection()
-        cursor = conn.cursor()
-        updates = []
+        # 驗證請求數據
+        valid, error = self.validator.validate_order_update(data)
+        if not valid:
+            return {"error": error, "code": 400}
+
+        cols = []
         params = []
-        
-        if data.get("property_id"):
-            updates.append("property_id = ?")
-            params.append(data["property_id"])
-        
-        if data.get("checkout_time"):
-            updates.append("checkout_time = ?")
-            params.append(data["checkout_time"])
-        
-        if data.get("price"):
-            updates.append("price = ?")
-            params.append(data["price"])
-        
-        if data.get("status"):
-            updates.append("status = ?")
-            params.append(data["status"])
-        
-        if data.get("cleaner_id"):
-            updates.append("assigned_cleaner_id = ?")
-            params.append(data["cleaner_id"])
-        
-        # voice_url 支持更新和刪除
-        if "voice_url" in data:
-            if data["voice_url"] is None:
-                updates.append("voice_url = ?")
-                params.append(None)
-            elif data["voice_url"]:
-                updates.append("voice_url = ?")
-                params.append(data["voice_url"])
-        
-        # text_notes 支持更新
-        if "text_notes" in data:
-            updates.append("text_notes = ?")
-            params.append(data["text_notes"])
-        
-        # completion_photos 支持更新
-        if "completion_photos" in data:
-            photos_str = data["completion_photos"]
-            updates.append("completion_photos = ?")
-            params.append(photos_str)
-        
-        # accepted_by_host 支持更新
-        if "accepted_by_host" in data:
-            updates.append("accepted_by_host = ?")
-            params.append(data["accepted_by_host"])
-        
-        
-        if updates:
+        for key, col in _ORDER_TRUTHY_FIELDS:
+            if data.get(key):
+                cols.append(col)
+                params.append(data[key])
+        # voice_url 支持更新和刪除（None 清空；空字符串不動）
+        if "voice_url" in data and (data["voice_url"] is None or data["voice_url"]):
+            cols.append("voice_url")
+            params.append(data["voice_url"])
+        # text_notes / completion_photos / accepted_by_host 給了就更新
+        for key in ("text_notes", "completion_photos", "accepted_by_host"):
+            if key in data:
+                cols.append(key)
+                params.append(data[key])
+
+        if cols:
             params.append(order_id)
-            cursor.execute(f"UPDATE orders SET {', '.join(updates)} WHERE id = ?", params)
-            conn.commit()
+            with self.pool.transaction() as conn:
+                conn.exec(_update_sql("orders", tuple(cols)), params)
             # 清除緩存
-            self.cache.clear()
-        
-        conn.close()
+            self.cache.invalidate_tag("orders")
+
         return {"message": "Order updated"}
-    
+
     def _delete_order(self, order_id):
-        conn = self.db._get_connection()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM orders WHERE id = ?", (order_id,))
-        conn.commit()
-        conn.close()
+        with self.pool.acquire() as conn:
+            conn.execute("DELETE FROM orders WHERE id = ?", (order_id,))
+            conn.commit()
+        self.cache.invalidate_tag("orders")
         return {"message": "Order deleted"}
-    
+
     def _cancel_order(self, order_id):
-        conn = self.db._get_connection()
-        cursor = conn.cursor()
-        cursor.execute("UPDATE orders SET status = 'cancelled' WHERE id = ?", (order_id,))
-        conn.commit()
-        conn.close()
+        with self.pool.acquire() as conn:
+            conn.execute("UPDATE orders SET status = 'cancelled' WHERE id = ?", (order_id,))
+            conn.commit()
+        self.cache.invalidate_tag("orders")
         return {"message": "Order cancelled"}
 
 
+# 請求體上限：超過直接 413，不給惡意 Content-Length 分配內存的機會
+_MAX_BODY = 1024 * 1024
+
+# UPDATE ... RETURNING 需要 SQLite 3.35+
+_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+# 內容在若干秒內穩定、被前端輪詢的 GET 端點，帶 ETag 支持條件請求
+_ETAG_PATHS = frozenset({"/api/stats", "/api/properties", "/api/cleaners"})
+
+# 靜態文件擴展名 -> Content-Type，代替逐個 endswith 比對
+_MIME_TYPES = {
+    ".css": "text/css; charset=utf-8",
+    ".js": "application/javascript; charset=utf-8",
+    ".json": "application/json; charset=utf-8",
+    ".html": "text/html; charset=utf-8",
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".webp": "image/webp",
+    ".webm": "audio/webm",
+    ".mp3": "audio/mpeg",
+    ".svg": "image/svg+xml",
+}
+
+
 class APIHandler(BaseHTTPRequestHandler):
     api: CleaningAPI = None
-    
+    # HTTP/1.1 + 正確的 Content-Length 才能讓瀏覽器走 keep-alive；
+    # 空閒連接 30 秒斷開，不讓 keep-alive 一直佔着池裡的工作線程
+    protocol_version = "HTTP/1.1"
+    timeout = 30
+    # 啟動時預載的靜態頁面: name -> (bytes, gzip bytes, content type, etag)
+    static_cache: Dict[str, tuple] = {}
+    # uploads 媒體緩存: (path, mtime, size) -> bytes；文件變了 key 就變
+    _upload_cache: Dict[tuple, bytes] = {}
+    _upload_cache_lock = threading.Lock()
+    _UPLOAD_CACHE_MAX_ENTRIES = 256
+    _UPLOAD_CACHE_MAX_FILE = 4 * 1024 * 1024
+
     def do_OPTIONS(self):
         self.send_response(200)
         self.send_header("Access-Control-Allow-Origin", "*")
         self.send_header("Access-Control-Allow-Methods", "GET, POST, PUT, DELETE, OPTIONS")
         self.send_header("Access-Control-Allow-Headers", "Content-Type")
+        # HTTP/1.1 下空響應也要有框定，否則這條 keep-alive 連接沒法復用
+        self.send_header("Content-Length", "0")
         self.end_headers()
     
     def do_GET(self):
@@ -1021,107 +1014,265 @@ class APIHandler(BaseHTTPRequestHandler):
     
     def do_DELETE(self):
         self._handle_request("DELETE")
-    
-    def do_OPTIONS(self):
+
+    def _serve_upload(self):
+        """上傳的媒體文件：內存緩存 + mtime/size 做 ETag 驗證新鮮度"""
+        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        static_file = os.path.realpath(os.path.join(base_dir, self.path.lstrip("/")))
+        uploads_root = os.path.join(base_dir, "uploads")
+        try:
+            if not static_file.startswith(uploads_root + os.sep) or not os.path.isfile(static_file):
+                raise OSError(static_file)
+            st = os.stat(static_file)
+        except OSError:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        etag = f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        ext = os.path.splitext(static_file)[1].lower()
+        content_type = _MIME_TYPES.get(ext, "application/octet-stream")
+
+        key = (static_file, st.st_mtime_ns, st.st_size)
+        with self._upload_cache_lock:
+            content = self._upload_cache.get(key)
+        if content is None:
+            with open(static_file, "rb") as f:
+                content = f.read()
+            if st.st_size <= self._UPLOAD_CACHE_MAX_FILE:
+                with self._upload_cache_lock:
+                    if len(self._upload_cache) >= self._UPLOAD_CACHE_MAX_ENTRIES:
+                        self._upload_cache.clear()
+                    self._upload_cache[key] = content
+
         self.send_response(200)
-        self.send_header("Access-Control-Allow-Origin", "*")
-        self.send_header("Access-Control-Allow-Methods", "GET, POST, PUT, DELETE, OPTIONS")
-        self.send_header("Access-Control-Allow-Headers", "Content-Type")
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "public, max-age=86400")
         self.end_headers()
-    
+        self.wfile.write(content)
+
     def _handle_request(self, method):
         # 靜態文件服務 (uploads)
         if self.path.startswith("/uploads/"):
-            try:
-                base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-                static_file = os.path.join(base_dir, self.path.lstrip("/"))
-                
-                if os.path.exists(static_file) and os.path.isfile(static_file):
-                    # MIME 類型檢測
-                    content_type = "application/octet-stream"
-                    if static_file.endswith(".css"):
-                        content_type = "text/css"
-                    elif static_file.endswith(".js"):
-                        content_type = "application/javascript"
-                    elif static_file.endswith(".png"):
-                        content_type = "image/png"
-                    elif static_file.endswith(".jpg") or static_file.endswith(".jpeg"):
-                        content_type = "image/jpeg"
-                    elif static_file.endswith(".webp"):
-                        content_type = "image/webp"
-                    elif static_file.endswith(".webm"):
-                        content_type = "audio/webm"
-                    elif static_file.endswith(".mp3"):
-                        content_type = "audio/mpeg"
-                    elif static_file.endswith(".svg"):
-                        content_type = "image/svg+xml"
-                    
-                    with open(static_file, "rb") as f:
-                        content = f.read()
-                    
-                    self.send_response(200)
-                    self.send_header("Content-Type", content_type)
-                    self.send_header("Content-Length", len(content))
-                    self.send_header("Cache-Control", "public, max-age=86400")
-                    self.end_headers()
-                    self.wfile.write(content)
-                    return
-            except Exception as e:
-                self.send_response(404)
-                self.end_headers()
-                return
-        
+            self._serve_upload()
+            return
+
         content_length = int(self.headers.get("Content-Length", 0))
-        body = self.rfile.read(content_length).decode("utf-8") if content_length > 0 else ""
-        
+        # 先驗大小再分配；JSON 解析直接吃 bytes，省一次 str 拷貝
+        if content_length > _MAX_BODY:
+            self.send_error(413)
+            return
+        body = self.rfile.read(content_length) if content_length > 0 else b""
+
         result = self.api.handle_request(method, self.path, body)
         
         # 靜態文件
         if "static" in result:
-            try:
-                static_file = os.path.join(
-                    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-                    result["static"]
-                )
-                with open(static_file, "r", encoding="utf-8") as f:
-                    content = f.read()
-                
-                # MIME 類型檢測
-                content_type = "text/html; charset=utf-8"
-                if static_file.endswith(".css"):
-                    content_type = "text/css; charset=utf-8"
-                elif static_file.endswith(".js"):
-                    content_type = "application/javascript; charset=utf-8"
-                elif static_file.endswith(".json"):
-                    content_type = "application/json; charset=utf-8"
-                elif static_file.endswith(".png"):
-                    content_type = "image/png"
-                elif static_file.endswith(".jpg") or static_file.endswith(".jpeg"):
-                    content_type = "image/jpeg"
-                elif static_file.endswith(".svg"):
-                    content_type = "image/svg+xml"
-                
+            cached = self.static_cache.get(result["static"])
+            if cached:
+                content, gz, content_type, etag = cached
+                # 客戶端帶了相同的 ETag 就省掉整個響應體
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                encoding = None
+                if gz is not None and "gzip" in self.headers.get("Accept-Encoding", ""):
+                    content, encoding = gz, "gzip"
                 self.send_response(200)
                 self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(content)))
+                self.send_header("ETag", etag)
+                self.send_header("Cache-Control", "public, max-age=300")
+                if encoding:
+                    self.send_header("Content-Encoding", encoding)
+                    self.send_header("Vary", "Accept-Encoding")
                 self.end_headers()
-                self.wfile.write(content.encode("utf-8"))
+                self.wfile.write(content)
                 return
-            except:
-                pass
+            # 磁盤回退只允許已知頁面和 css/ 目錄內的文件；realpath 斷掉
+            # ../ 逃逸（同 _serve_upload 的做法），不然 /css/../key.pem
+            # 這種路徑會把倉庫裡的任意文件讀出去
+            base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            static_file = os.path.realpath(os.path.join(base_dir, result["static"]))
+            css_root = os.path.join(base_dir, "css")
+            allowed = (static_file.startswith(css_root + os.sep)
+                       or static_file in [os.path.join(base_dir, name)
+                                          for name in ("index.html", "host.html",
+                                                       "cleaner.html", "admin.html")])
+            if allowed:
+                try:
+                    with open(static_file, "r", encoding="utf-8") as f:
+                        content = f.read()
+
+                    ext = os.path.splitext(static_file)[1].lower()
+                    content_type = _MIME_TYPES.get(ext, "text/html; charset=utf-8")
+
+                    payload = content.encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", content_type)
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                    return
+                except:
+                    pass
         
-        self.send_response(200 if "error" not in result else result.get("code", 500))
+        # 流式響應：生成器產出的 JSON 片段用 chunked 編碼直寫 socket
+        stream = result.get("stream")
+        if stream is not None:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.end_headers()
+            try:
+                for chunk in stream:
+                    if chunk:
+                        self.wfile.write(b"%x\r\n" % len(chunk) + chunk + b"\r\n")
+                self.wfile.write(b"0\r\n\r\n")
+            finally:
+                stream.close()  # 客戶端斷開也要歸還數據庫連接
+            return
+
+        payload = _dumps(result)
+        status = 200 if "error" not in result else result.get("code", 500)
+
+        # 輪詢型端點：內容沒變就回 304，省掉重傳整個 JSON
+        etag = None
+        if method == "GET" and status == 200 and self.path.split("?", 1)[0] in _ETAG_PATHS:
+            etag = hashlib.blake2b(payload, digest_size=8).hexdigest()
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+
+        self.send_response(status)
         self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
         self.send_header("Access-Control-Allow-Origin", "*")
+        if etag:
+            self.send_header("ETag", etag)
         self.end_headers()
-        self.wfile.write(json.dumps(result).encode("utf-8"))
+        self.wfile.write(payload)
     
     def log_message(self, format, *args):
-        print(f"[API] {args[0]}")
+        # 默認 WARNING：熱路徑上只剩一次 isEnabledFor 檢查；
+        # 真要看請求日誌時把 CLEANING_LOG_LEVEL 調到 DEBUG
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[API] %s", args[0])
+
+
+# 日誌經 QueueHandler 入隊，真正的寫出在後台線程，不阻塞請求
+logger = logging.getLogger("cleaning.api")
+
+
+def _setup_logging():
+    if logger.handlers:
+        return
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(QueueHandler(log_queue))
+    logger.setLevel(os.environ.get("CLEANING_LOG_LEVEL", "WARNING"))
+    listener = QueueListener(log_queue, logging.StreamHandler())
+    listener.daemon = True
+    listener.start()
+
+
+class PooledHTTPServer(ThreadingHTTPServer):
+    """請求交給固定大小的線程池處理，而不是每個連接都新建線程。
+
+    無上限的 thread-per-request 在慢客戶端/惡意連接下會耗盡線程；
+    池滿時新請求在隊列裡排隊。
+    """
+    daemon_threads = True
+    # 默認 backlog 只有 5：池忙時突發連接會被內核直接拒掉
+    request_queue_size = 128
+
+    def __init__(self, server_address, handler_class, max_workers=32):
+        super().__init__(server_address, handler_class)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="http")
+
+    def process_request(self, request, client_address):
+        self._executor.submit(self.process_request_thread, request, client_address)
+
+    def server_close(self):
+        super().server_close()
+        self._executor.shutdown(wait=False)
+
+
+def _optimize_loop(pool, interval=900):
+    """每 15 分鐘跑一次 PRAGMA optimize，長時間運行下保持查詢計劃質量"""
+    while True:
+        time.sleep(interval)
+        try:
+            with pool.acquire() as conn:
+                conn.execute("PRAGMA optimize")
+        except Exception as e:
+            print(f"PRAGMA optimize error: {e}")
+
+
+PID_FILE = "/tmp/cleaning_service.pid"
+
+
+def _write_pid_file():
+    try:
+        with open(PID_FILE, "w") as f:
+            f.write(str(os.getpid()))
+        atexit.register(_remove_pid_file)
+    except OSError:
+        pass
+
+
+def _remove_pid_file():
+    try:
+        os.unlink(PID_FILE)
+    except OSError:
+        pass
 
 
 def run_server(api, host="0.0.0.0", port=80):
     APIHandler.api = api
-    server = HTTPServer((host, port), APIHandler)
+
+    _write_pid_file()
+    _setup_logging()
+    threading.Thread(target=_optimize_loop, args=(api.pool,), daemon=True).start()
+
+    # 靜態資源每次部署才變：啟動時讀進內存，預壓縮並算好 ETag
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    static_files = ["index.html", "host.html", "cleaner.html", "admin.html"]
+    css_dir = os.path.join(base_dir, "css")
+    if os.path.isdir(css_dir):
+        static_files += [f"css/{name}" for name in os.listdir(css_dir)]
+    for name in static_files:
+        try:
+            with open(os.path.join(base_dir, name), "rb") as f:
+                content = f.read()
+        except OSError:
+            continue
+        gz = gzip.compress(content, 6)
+        content_type = ("text/css; charset=utf-8" if name.endswith(".css")
+                        else "text/html; charset=utf-8")
+        APIHandler.static_cache[name] = (
+            content,
+            gz if len(gz) < len(content) else None,
+            content_type,
+            hashlib.blake2b(content, digest_size=16).hexdigest(),
+        )
+
+    # 請求並發處理（帶上限的線程池）：WAL 下 GET 不再被 POST 卡住
+    server = PooledHTTPServer((host, port), APIHandler)
     print(f"Running on http://{host}:{port}")
     server.serve_forever()
 
@@ -95,3 +95,18 @@ async def serve_static(path: str):
     if os.path.exists(file_path):
         return FileResponse(file_path)
     return FileResponse(os.path.join(BASE_DIR, "..", "index.html"))
+
+
+if __name__ == "__main__":
+    import uvicorn
+    from app.core.config import settings
+
+    # uvloop + httptools come from uvicorn[standard]; "auto" picks them
+    # when installed and falls back to asyncio/h11 otherwise
+    uvicorn.run(
+        "app.main:app",
+        host=settings.HOST,
+        port=settings.PORT,
+        loop="auto",
+        http="auto",
+    )
@@ -1,16 +1,205 @@
 """Cleaner Service Database Models"""
+import atexit
+import hashlib
+import hmac
+import os
+import queue
+import secrets
 import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
 from datetime import datetime
 from typing import Optional, List
 
+_CODE_SECRET = os.environ.get("CLEANING_CODE_SECRET", "cleaning-service").encode()
+
+
+def new_code() -> str:
+    """Random 6-digit login code from the OS CSPRNG.
+
+    Login codes are credentials, so they come from secrets rather than
+    the module-level Mersenne Twister.
+    """
+    return f"{secrets.randbelow(900000) + 100000:06d}"
+
+
+def hash_code(code) -> bytes:
+    """Keyed BLAKE2b digest of a login code.
+
+    Verification compares this 16-byte digest instead of the plaintext
+    column; BLAKE2b is a stdlib C primitive so the cost is negligible.
+    """
+    return hashlib.blake2b(str(code).encode(), key=_CODE_SECRET, digest_size=16).digest()
+
+
+def verify_code(code, code_hash) -> bool:
+    """Constant-time check of a supplied code against a stored digest."""
+    return code_hash is not None and hmac.compare_digest(hash_code(code), code_hash)
+
+
+def _tune_connection(conn, db_path, readonly=False):
+    """Apply the standard PRAGMAs to a new connection.
+
+    WAL lets readers proceed during writes; NORMAL halves fsyncs per
+    commit. Not applicable to in-memory databases, and a read-only
+    connection cannot switch journal modes.
+    """
+    if db_path == ":memory:":
+        return
+    if not readonly:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    # Map the db file (256 MB window) and keep a 64 MB page cache so
+    # repeated point reads stay off the syscall path
+    conn.execute("PRAGMA mmap_size=268435456")
+    conn.execute("PRAGMA cache_size=-65536")
+
+
+class CachedConnection:
+    """Wrap a sqlite3.Connection with a per-statement cursor cache.
+
+    Keeping one cursor alive per SQL string lets sqlite3 reuse the
+    prepared statement instead of re-parsing the text on every call.
+    Hot paths call exec(sql, params); everything else passes through
+    to the underlying connection.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._stmt_cache = {}
+
+    def exec(self, sql, params=()):
+        cur = self._stmt_cache.get(sql)
+        if cur is None:
+            cur = self._conn.cursor()
+            self._stmt_cache[sql] = cur
+        cur.execute(sql, params)
+        return cur
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class ConnectionPool:
+    """Thread-safe pool of SQLite connections reused across requests.
+
+    One shared read-write connection (mutex-guarded; SQLite serializes
+    writers at the file level anyway) plus a small set of read-only
+    connections handed out through a queue. Avoids the per-request
+    connect/close churn of opening the db/-wal/-shm files every call.
+    """
+
+    def __init__(self, db_path: str = "cleaning.db", readers: int = 4):
+        self.db_path = db_path
+        self._rw_lock = threading.Lock()
+        self._rw = self._connect(readonly=False)
+        # ':memory:' reads share the RW connection, so readers would
+        # just be separate empty databases
+        reader_count = 0 if db_path == ":memory:" else readers
+        self._readers = queue.Queue(maxsize=max(reader_count, 1))
+        for _ in range(reader_count):
+            self._readers.put(self._connect(readonly=True))
+
+    def _connect(self, readonly: bool):
+        if readonly and self.db_path != ":memory:":
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True,
+                                   check_same_thread=False, timeout=30,
+                                   cached_statements=256)
+        else:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30,
+                                   cached_statements=256)
+        _tune_connection(conn, self.db_path, readonly=readonly)
+        conn.row_factory = sqlite3.Row
+        return CachedConnection(conn)
+
+    @contextmanager
+    def acquire(self, readonly: bool = False):
+        # ':memory:' databases are per-connection, so reads must share the
+        # single read-write connection to see any data at all.
+        if readonly and self.db_path != ":memory:":
+            conn = self._readers.get()
+            try:
+                yield conn
+            finally:
+                # A leftover read transaction would pin the WAL snapshot
+                if conn.in_transaction:
+                    conn.rollback()
+                self._readers.put(conn)
+        else:
+            with self._rw_lock:
+                try:
+                    yield self._rw
+                except Exception:
+                    self._rw.rollback()
+                    raise
+                finally:
+                    # Safety net: a handler that ran DML and returned
+                    # early without commit must not wedge the shared
+                    # write connection in an open transaction
+                    if self._rw.in_transaction:
+                        self._rw.rollback()
+
+    @contextmanager
+    def transaction(self):
+        """Write transaction: BEGIN IMMEDIATE on entry, COMMIT on clean
+        exit, ROLLBACK on exception. Groups the statements into a single
+        WAL fsync and avoids deferred-lock upgrade races.
+        """
+        with self.acquire() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except Exception:
+                conn.rollback()
+                raise
+            else:
+                conn.commit()
+
+    def close(self):
+        with self._rw_lock:
+            self._rw.close()
+        while not self._readers.empty():
+            self._readers.get_nowait().close()
+
+
 class Database:
     def __init__(self, db_path: str = "cleaning.db"):
         self.db_path = db_path
+        # One persistent connection per thread: repository calls stop
+        # paying the connect/schema-parse/close cost per statement
+        self._local = threading.local()
+        self._conns = []
+        self._conns_lock = threading.Lock()
         self._init_db()
-    
+        atexit.register(self.close_all)
+
     def _get_connection(self):
-        return sqlite3.connect(self.db_path)
-    
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30,
+                                   cached_statements=256)
+            self._tune_connection(conn)
+            self._local.conn = conn
+            with self._conns_lock:
+                self._conns.append(conn)
+        return conn
+
+    def close_all(self):
+        with self._conns_lock:
+            for conn in self._conns:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            self._conns.clear()
+        self._local = threading.local()
+
+    def _tune_connection(self, conn):
+        _tune_connection(conn, self.db_path)
+
     def _init_db(self):
         conn = self._get_connection()
         cursor = conn.cursor()
@@ -64,228 +253,378 @@ class Database:
             )
         """)
         
+        # The grab-order flow is a single conditional UPDATE now; clean up
+        # the lock table (and any stale rows) older deployments still carry
+        cursor.execute("DROP TABLE IF EXISTS order_locks")
+
+        # Geocode results are effectively immutable per address; cached
+        # rows short-circuit the Nominatim round trip across restarts
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS geocode_cache (
+                key BLOB PRIMARY KEY,
+                json TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        # Hosts table (production DBs predate this bootstrap; the unique
+        # index on phone is required by the login upsert either way)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS hosts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                phone TEXT NOT NULL,
+                code TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_hosts_phone ON hosts(phone)")
+
+        # Columns added after the original release; both fresh and older
+        # databases pick them up here (ALTER is a no-op when present)
+        for table, column in (
+            ("properties", "postal_code TEXT DEFAULT ''"),
+            ("properties", "floor INTEGER DEFAULT 0"),
+            ("properties", "area REAL DEFAULT 0"),
+            ("properties", "province TEXT DEFAULT ''"),
+            ("properties", "city TEXT DEFAULT ''"),
+            ("properties", "street TEXT DEFAULT ''"),
+            ("properties", "house_number TEXT DEFAULT ''"),
+            ("properties", "host_phone TEXT DEFAULT ''"),
+            ("properties", "latitude REAL"),
+            ("properties", "longitude REAL"),
+            ("orders", "voice_url TEXT"),
+            ("orders", "text_notes TEXT"),
+            ("orders", "completion_photos TEXT"),
+            ("orders", "accepted_by_host INTEGER DEFAULT 0"),
+        ):
+            try:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column}")
+            except sqlite3.OperationalError:
+                pass  # column already exists
+
+        # Login codes are verified against a keyed hash; add the column
+        # on older databases and backfill it from the plaintext codes
+        for table in ("hosts", "cleaners"):
+            try:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN code_hash BLOB")
+            except sqlite3.OperationalError:
+                pass  # column already exists
+            rows = cursor.execute(
+                f"SELECT id, code FROM {table} WHERE code_hash IS NULL AND code IS NOT NULL"
+            ).fetchall()
+            for row_id, code in rows:
+                cursor.execute(f"UPDATE {table} SET code_hash = ? WHERE id = ?",
+                               (hash_code(code), row_id))
+
+        # Materialized dashboard counters, maintained by triggers so
+        # /api/stats is a single-row read instead of three COUNT scans.
+        # Resynced from the real aggregates on every boot to kill drift.
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS stats (
+                id INTEGER PRIMARY KEY,
+                active_properties INTEGER NOT NULL DEFAULT 0,
+                available_cleaners INTEGER NOT NULL DEFAULT 0,
+                open_orders INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        for table, column, live in (
+            ("properties", "active_properties", "'active'"),
+            ("cleaners", "available_cleaners", "'available'"),
+            ("orders", "open_orders", "'open'"),
+        ):
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_ins AFTER INSERT ON {table} BEGIN
+                    UPDATE stats SET {column} = {column} + (NEW.status = {live}) WHERE id = 1;
+                END
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_del AFTER DELETE ON {table} BEGIN
+                    UPDATE stats SET {column} = {column} - (OLD.status = {live}) WHERE id = 1;
+                END
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_upd AFTER UPDATE OF status ON {table} BEGIN
+                    UPDATE stats SET {column} = {column} + (NEW.status = {live}) - (OLD.status = {live}) WHERE id = 1;
+                END
+            """)
+        cursor.execute("""
+            INSERT OR REPLACE INTO stats (id, active_properties, available_cleaners, open_orders)
+            VALUES (1,
+                (SELECT COUNT(*) FROM properties WHERE status = 'active'),
+                (SELECT COUNT(*) FROM cleaners WHERE status = 'available'),
+                (SELECT COUNT(*) FROM orders WHERE status = 'open'))
+        """)
+
+        # Point lookups and the status+checkout listing would otherwise
+        # degrade to full scans as the tables grow
+        # Unique: the registration retry loop relies on the INSERT itself
+        # failing on a code collision (earlier revisions created these
+        # non-unique, hence the DROP)
+        cursor.execute("DROP INDEX IF EXISTS idx_hosts_code")
+        cursor.execute("DROP INDEX IF EXISTS idx_cleaners_code")
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_hosts_code_uq ON hosts(code)")
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_cleaners_code_uq ON cleaners(code)")
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_cleaners_phone ON cleaners(phone)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_hosts_code_hash ON hosts(code_hash)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_status_checkout ON orders(status, checkout_time)")
+        # Secondary indexes for the joins and per-cleaner stats; plain
+        # status filters are covered by the composite prefix above
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_assigned_cleaner ON orders(assigned_cleaner_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_property ON orders(property_id)")
+        cursor.execute("""CREATE INDEX IF NOT EXISTS idx_orders_completed_created
+                          ON orders(created_at) WHERE status = 'completed'""")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_cleaners_status ON cleaners(status)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_properties_status ON properties(status)")
+
         conn.commit()
-        conn.close()
+        cursor.execute("PRAGMA optimize")
+
+
+# Slotted dataclasses: no per-instance __dict__, and field order matches
+# the explicit SELECT lists below so rows map positionally - no Row
+# wrapper, no dict, no kwargs unpacking per row
 
 
+@dataclass(slots=True)
 class Property:
-    def __init__(self, id=None, name="", address="", postal_code="", bedrooms=1, bathrooms=1, floor=0, area=0,
-                 cleaning_time_minutes=120, cleaning_checklist="", notes="", status="active", created_at=None,
-                 province="", city="", street="", house_number="", host_phone=""):
-        self.id = id
-        self.name = name
-        self.address = address
-        self.postal_code = postal_code
-        self.bedrooms = bedrooms
-        self.bathrooms = bathrooms
-        self.floor = floor
-        self.area = area
-        self.province = province
-        self.city = city
-        self.street = street
-        self.house_number = house_number
-        self.host_phone = host_phone
-        self.cleaning_time_minutes = cleaning_time_minutes
-        self.cleaning_checklist = cleaning_checklist
-        self.notes = notes
-        self.status = status
-        self.created_at = created_at
+    id: Optional[int] = None
+    name: str = ""
+    address: str = ""
+    postal_code: str = ""
+    bedrooms: int = 1
+    bathrooms: int = 1
+    floor: int = 0
+    area: float = 0
+    province: str = ""
+    city: str = ""
+    street: str = ""
+    house_number: str = ""
+    host_phone: str = ""
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    cleaning_time_minutes: int = 120
+    cleaning_checklist: str = ""
+    notes: str = ""
+    status: str = "active"
+    created_at: Optional[str] = None
 
 
+@dataclass(slots=True)
 class Cleaner:
-    def __init__(self, id=None, name="", phone="", email="", status="available", rating=5.0, total_jobs=0, created_at=None, code=None):
-        self.id = id
-        self.name = name
-        self.phone = phone
-        self.email = email
-        self.status = status
-        self.rating = rating
-        self.total_jobs = total_jobs
-        self.created_at = created_at
-        self.code = code
+    id: Optional[int] = None
+    name: str = ""
+    phone: str = ""
+    email: str = ""
+    status: str = "available"
+    rating: float = 5.0
+    total_jobs: int = 0
+    created_at: Optional[str] = None
+    code: Optional[str] = None
 
 
+@dataclass(slots=True)
 class Job:
-    def __init__(self, id=None, property_id=None, cleaner_id=None, 
-                 checkin_time=None, checkout_time="", status="pending",
-                 assigned_at=None, started_at=None, completed_at=None,
-                 checklist="", photos="", notes="", rating=None):
-        self.id = id
-        self.property_id = property_id
-        self.cleaner_id = cleaner_id
-        self.checkin_time = checkin_time
-        self.checkout_time = checkout_time
-        self.status = status
-        self.assigned_at = assigned_at
-        self.started_at = started_at
-        self.completed_at = completed_at
-        self.checklist = checklist
-        self.photos = photos
-        self.notes = notes
-        self.rating = rating
+    id: Optional[int] = None
+    property_id: Optional[int] = None
+    cleaner_id: Optional[int] = None
+    checkin_time: Optional[str] = None
+    checkout_time: str = ""
+    status: str = "pending"
+    assigned_at: Optional[str] = None
+    started_at: Optional[str] = None
+    completed_at: Optional[str] = None
+    checklist: str = ""
+    photos: str = ""
+    notes: str = ""
+    rating: Optional[float] = None
+
+
+# Repository SQL as module constants: the text is built (and interned)
+# once, so per-connection statement caches key on identical strings
+SQL_INSERT_PROPERTY = """
+    INSERT INTO properties (name, address, postal_code, bedrooms, bathrooms, floor, area, province, city, street, house_number, cleaning_time_minutes, cleaning_checklist, notes)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+# Columns in Property field order so rows construct positionally
+_PROPERTY_COLS = """id, name, address, postal_code, bedrooms, bathrooms, floor, area,
+    province, city, street, house_number, host_phone, latitude, longitude,
+    cleaning_time_minutes, cleaning_checklist, notes, status, created_at"""
+SQL_SELECT_PROPERTIES = f"SELECT {_PROPERTY_COLS} FROM properties WHERE status = ? ORDER BY name"
+SQL_SELECT_PROPERTY_BY_ID = f"SELECT {_PROPERTY_COLS} FROM properties WHERE id = ?"
+SQL_INSERT_CLEANER = """
+    INSERT INTO cleaners (name, phone, email, code, code_hash)
+    VALUES (?, ?, ?, ?, ?)
+"""
+# Explicit columns: keeps code_hash out of the Cleaner model
+SQL_SELECT_CLEANERS = """
+    SELECT id, name, phone, email, status, rating, total_jobs, created_at, code
+    FROM cleaners WHERE status = ? ORDER BY rating DESC
+"""
+SQL_UPDATE_CLEANER_STATUS = "UPDATE cleaners SET status = ? WHERE id = ?"
+# created_at is compared as a half-open range instead of wrapping every
+# row in DATE(): the predicate stays sargable and rides the partial
+# idx_orders_completed_created index
+SQL_SELECT_STATS = """
+    SELECT active_properties, available_cleaners, open_orders,
+           (SELECT COUNT(*) FROM orders
+            WHERE status = 'completed'
+              AND created_at >= date('now') AND created_at < date('now', '+1 day'))
+    FROM stats WHERE id = 1
+"""
+# Explicit projection for get_orders, in SELECT order
+ORDER_LIST_COLS = (
+    "id", "property_id", "cleaner_id", "host_name", "host_phone",
+    "checkout_time", "price", "status", "assigned_cleaner_id", "assigned_at",
+    "created_at", "voice_url", "text_notes", "completion_photos", "accepted_by_host",
+    "property_name", "property_address", "cleaner_name",
+)
+SQL_SELECT_ORDERS = """
+    SELECT o.id, o.property_id, o.cleaner_id, o.host_name, o.host_phone,
+           o.checkout_time, o.price, o.status, o.assigned_cleaner_id, o.assigned_at,
+           o.created_at, o.voice_url, o.text_notes, o.completion_photos, o.accepted_by_host,
+           p.name, p.address, c.name
+    FROM orders o
+    LEFT JOIN properties p ON o.property_id = p.id
+    LEFT JOIN cleaners c ON o.assigned_cleaner_id = c.id
+    WHERE 1=1
+"""
+# One round-trip for the three per-cleaner aggregates
+SQL_SELECT_CLEANER_STATS = """
+    SELECT
+      (SELECT COUNT(*) FROM orders
+       WHERE assigned_cleaner_id = ?1 AND status = 'completed'
+         AND created_at >= date('now') AND created_at < date('now', '+1 day')),
+      (SELECT COUNT(*) FROM orders
+       WHERE assigned_cleaner_id = ?1 AND status = 'completed'),
+      (SELECT COALESCE(SUM(price), 0) FROM orders
+       WHERE assigned_cleaner_id = ?1 AND status = 'completed')
+"""
+SQL_INSERT_ORDER = """
+    INSERT INTO orders (property_id, checkout_time, price, status, host_name, host_phone)
+    VALUES (?, ?, ?, 'open', ?, ?)
+"""
 
 
 class CleaningRepository:
     def __init__(self, db: Database):
         self.db = db
-    
+
     # Properties
     def add_property(self, prop: Property) -> int:
         conn = self.db._get_connection()
         cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO properties (name, address, postal_code, bedrooms, bathrooms, floor, area, province, city, street, house_number, cleaning_time_minutes, cleaning_checklist, notes)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (prop.name, prop.address, prop.postal_code, prop.bedrooms, prop.bathrooms, prop.floor, prop.area,
+        cursor.execute(SQL_INSERT_PROPERTY,
+              (prop.name, prop.address, prop.postal_code, prop.bedrooms, prop.bathrooms, prop.floor, prop.area,
               prop.province, prop.city, prop.street, prop.house_number,
               prop.cleaning_time_minutes, prop.cleaning_checklist, prop.notes))
         job_id = cursor.lastrowid
         conn.commit()
-        conn.close()
         return job_id
     
     def get_properties(self, status="active") -> List[Property]:
         conn = self.db._get_connection()
-        conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM properties WHERE status = ? ORDER BY name", (status,))
+        cursor.row_factory = None
+        cursor.execute(SQL_SELECT_PROPERTIES, (status,))
         rows = cursor.fetchall()
-        conn.close()
-        return [Property(**dict(row)) for row in rows]
+        return [Property(*row) for row in rows]
     
     def get_property(self, prop_id: int) -> Optional[Property]:
         conn = self.db._get_connection()
-        conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM properties WHERE id = ?", (prop_id,))
+        cursor.row_factory = None
+        cursor.execute(SQL_SELECT_PROPERTY_BY_ID, (prop_id,))
         row = cursor.fetchone()
-        conn.close()
-        return Property(**dict(row)) if row else None
+        return Property(*row) if row else None
     
     # Cleaners
     def add_cleaner(self, cleaner: Cleaner) -> int:
         conn = self.db._get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO cleaners (name, phone, email)
-            VALUES (?, ?, ?)
-        """, (cleaner.name, cleaner.phone, cleaner.email))
-        job_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(SQL_INSERT_CLEANER,
+                  (cleaner.name, cleaner.phone, cleaner.email, cleaner.code,
+                   hash_code(cleaner.code) if cleaner.code else None))
+            job_id = cursor.lastrowid
+            conn.commit()
+        except sqlite3.IntegrityError:
+            # code-collision retry path: keep the shared thread-local
+            # connection clean for the next attempt
+            conn.rollback()
+            raise
         return job_id
     
     def get_cleaners(self, status="available") -> List[Cleaner]:
         conn = self.db._get_connection()
-        conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM cleaners WHERE status = ? ORDER BY rating DESC", (status,))
+        cursor.row_factory = None
+        cursor.execute(SQL_SELECT_CLEANERS, (status,))
         rows = cursor.fetchall()
-        conn.close()
-        return [Cleaner(**dict(row)) for row in rows]
+        return [Cleaner(*row) for row in rows]
     
     def update_cleaner_status(self, cleaner_id: int, status: str):
         conn = self.db._get_connection()
         cursor = conn.cursor()
-        cursor.execute("UPDATE cleaners SET status = ? WHERE id = ?", (status, cleaner_id))
+        cursor.execute(SQL_UPDATE_CLEANER_STATUS, (status, cleaner_id))
         conn.commit()
-        conn.close()
     
     # Orders
     def create_order(self, order) -> int:
         conn = self.db._get_connection()
         cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO orders (property_id, checkout_time, price, status, host_name, host_phone)
-            VALUES (?, ?, ?, 'open', ?, ?)
-        """, (order.property_id, order.checkout_time, order.price, order.host_name, order.host_phone))
+        cursor.execute(SQL_INSERT_ORDER,
+              (order.property_id, order.checkout_time, order.price, order.host_name, order.host_phone))
         job_id = cursor.lastrowid
         conn.commit()
-        conn.close()
         return job_id
     
     def get_orders(self, status=None) -> List[dict]:
         conn = self.db._get_connection()
-        conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
-        
-        query = """
-            SELECT o.*, p.name as property_name, p.address as property_address,
-                   c.name as cleaner_name
-            FROM orders o
-            LEFT JOIN properties p ON o.property_id = p.id
-            LEFT JOIN cleaners c ON o.assigned_cleaner_id = c.id
-            WHERE 1=1
-        """
+        # Bare tuples + one zip per row instead of a sqlite3.Row wrapper
+        cursor.row_factory = None
+
+        query = SQL_SELECT_ORDERS
         params = []
         if status:
             query += " AND o.status = ?"
             params.append(status)
-        
+
         query += " ORDER BY o.checkout_time DESC"
-        
+
         cursor.execute(query, params)
         rows = cursor.fetchall()
-        conn.close()
-        return [dict(row) for row in rows]
+        return [dict(zip(ORDER_LIST_COLS, row)) for row in rows]
     
     def get_stats(self) -> dict:
         conn = self.db._get_connection()
         cursor = conn.cursor()
-        
-        cursor.execute("SELECT COUNT(*) FROM properties WHERE status = 'active'")
-        properties = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM cleaners WHERE status = 'available'")
-        available_cleaners = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM orders WHERE status = 'open'")
-        pending_jobs = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM orders WHERE status = 'completed' AND DATE(created_at) = DATE('now')")
-        completed_today = cursor.fetchone()[0]
-        
-        conn.close()
+
+        # Counters come from the trigger-maintained stats row;
+        # completed_today depends on the current date so it stays a query
+        cursor.execute(SQL_SELECT_STATS)
+        row = cursor.fetchone()
+
         return {
-            "properties": properties,
-            "available_cleaners": available_cleaners,
-            "pending_jobs": pending_jobs,
-            "completed_today": completed_today
+            "properties": row[0],
+            "available_cleaners": row[1],
+            "pending_jobs": row[2],
+            "completed_today": row[3]
         }
     
     # Cleaner specific stats
     def get_cleaner_stats(self, cleaner_id: int) -> dict:
         conn = self.db._get_connection()
         cursor = conn.cursor()
-        
-        # Today's completed orders (using created_at as completion time)
-        cursor.execute("""
-            SELECT COUNT(*) FROM orders 
-            WHERE assigned_cleaner_id = ? 
-            AND status = 'completed' 
-            AND DATE(created_at) = DATE('now')
-        """, (cleaner_id,))
-        completed_today = cursor.fetchone()[0]
-        
-        # Total completed orders
-        cursor.execute("""
-            SELECT COUNT(*) FROM orders 
-            WHERE assigned_cleaner_id = ? 
-            AND status = 'completed'
-        """, (cleaner_id,))
-        total_completed = cursor.fetchone()[0]
-        
-        # Total earnings
-        cursor.execute("""
-            SELECT COALESCE(SUM(price), 0) FROM orders 
-            WHERE assigned_cleaner_id = ? 
-            AND status = 'completed'
-        """, (cleaner_id,))
-        total_earnings = cursor.fetchone()[0]
-        
-        conn.close()
+
+        # today's count (created_at as completion time), total count and
+        # earnings in a single statement
+        cursor.execute(SQL_SELECT_CLEANER_STATS, (cleaner_id,))
+        row = cursor.fetchone()
+
         return {
-            "completed_today": completed_today,
-            "total_orders": total_completed,
-            "total_earnings": total_earnings
+            "completed_today": row[0],
+            "total_orders": row[1],
+            "total_earnings": row[2]
         }
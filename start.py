@@ -3,32 +3,49 @@
 
 import os
 import signal
-import subprocess
 import sys
 import time
 
+PID_FILE = '/tmp/cleaning_service.pid'
+
 def kill_old_process():
-    """殺掉舊進程"""
+    """按 PID 文件精確停掉舊進程
+
+    以前是 pkill -f 'api/server.py' 加固定睡 1 秒：可能誤殺無關進程，
+    而且每次啟動都白等一秒。現在讀 run_server 寫的 PID 文件，發
+    SIGTERM 後輪詢到進程真正退出為止（上限 ~2 秒）。
+    """
+    try:
+        with open(PID_FILE) as f:
+            pid = int(f.read().strip())
+    except (OSError, ValueError):
+        return
+
     try:
-        result = subprocess.run(['pkill', '-f', 'api/server.py'], 
-                              capture_output=True, text=True)
-    except:
-        pass
+        os.kill(pid, signal.SIGTERM)
+    except ProcessLookupError:
+        return
+
+    for _ in range(20):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return
+        time.sleep(0.1)
 
 def start_server():
     """啟動服務器"""
     os.chdir('/home/nico/projects/cleaning_service')
-    
+
     # 添加路徑
     sys.path.insert(0, '.')
-    
+
     from api.server import CleaningAPI, run_server
-    
+
     print("🚀 啟動清潔服務系統...")
     api = CleaningAPI('cleaning.db')
     run_server(api, host='0.0.0.0', port=80)
 
 if __name__ == '__main__':
     kill_old_process()
-    time.sleep(1)
     start_server()